@@ -1,199 +1,899 @@
 import random
-from extension.board_utils import list_legal_moves_for, copy_piece_move
-from extension.board_rules import get_result
-import time
+from extension.board_utils import list_legal_moves_for
+from extension.fast_board import FastBoard, PIECE_NAMES, TYPE_MASK, WHITE, \
+    PAWN, KING, BLACK_BIT, CHECKMATE, NO_KINGS, STALEMATE, ONLY_2_KINGS, FIVEFOLD
+from extension import evaluation
+from extension.evaluation import PIECE_VALUES, mobility
+from extension.batch_eval import encode, evaluate_batch
+from extension.transposition import EXACT, LOWER, UPPER, encode_move, decode_move
+from extension.movegen import move_squares, CAPTURE, PROMOTION, TACTICAL
+from extension.notation import move_text
+from extension.search_control import SearchContext, SearchController, SearchAborted, time_limit_for, \
+    depth_limit_for, history_for
+from extension.parallel import HelperGroup, PonderSearch, workers_for
+from extension.ordering import sort_tactical
+from extension.session import Session
+from extension.tablebase import load_tablebases, WIN, LOSS
+from extension.dfpn import solve_mate
+from extension.see import see, PROMOTION_GAIN
+from extension.search_stats import SearchStats, profiled
+import atexit
+from array import array
+import logging
+from time import perf_counter
+
+# iteration progress goes to this logger at DEBUG level, so it is silent unless logging is configured
+logger = logging.getLogger("agent")
+
+# callables that receive the SearchStats of every search (e.g. search_stats.LoggingSink, JsonlSink); none by default
+STATS_SINKS = []
+
+# search the expected position on the opponent's time after every move; a dict 'var' can set "ponder" per call
+PONDER = False
+
+# the longest a ponder search runs when nobody stops it
+PONDER_TIME_LIMIT = 600
+
+# the Session agent() keeps between moves unless a dict 'var' passes its own "session" (see session_for)
+_session = None
 
 WIN_SCORE = 10000000
 LOSS_SCORE = -9000000
 DRAW_SCORE = 0
 
-PIECE_VALUES = {
-    "King": 0,
-    "Queen": 900,
-    "Right": 750,
-    "Bishop": 300,
-    "Knight": 300,
-    "Pawn": 100
-}
+# memory cap for the transposition table built by agent()
+TT_SIZE_MB = 16
+
+# iterative deepening never goes past this, even when every line ends early
+MAX_SEARCH_DEPTH = 64
+
+# mate scores stored in the transposition table are at least this far from zero
+MATE_BOUND = WIN_SCORE - MAX_SEARCH_DEPTH
+
+# bounds wider than any score the search can return
+INFINITY = 999999999
+
+# half-width of the first aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+
+# null-move pruning: at non-PV nodes this deep, pass the turn and search R = NULL_MOVE_REDUCTION
+# + depth // 4 plies less; if the opponent still cannot get below beta, the node fails high
+NULL_MOVE = True
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+
+# zugzwang guard: stalemate loses for the side to move (board_rules), so passing is a real
+# advantage once material runs low; no null move with fewer pieces than this on the board
+NULL_MOVE_MIN_PIECES = 7
+
+# late move reductions: quiet moves after the first LMR_MIN_MOVES at nodes this deep are searched
+# one ply shallower (two from 2 * LMR_MIN_MOVES on, if depth allows) and re-searched if they beat alpha
+LMR = True
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+
+# depth-1 nodes score all their children with one evaluate_batch() call and visit them best first.
+# Off by default: it evaluates children a beta cutoff would have skipped, which costs more than
+# the batching saves in bench.py's search suite; worth it for a more expensive evaluation, such as
+# evaluation.MOBILITY. Its children are scored statically, so it only applies with QUIESCENCE off
+BATCH_FRONTIER = False
+
+# quiescence search at the horizon: captures and promotions only, with stand-pat, until the
+# position is quiet. Captures that lose material by static exchange evaluation (extension/see.py)
+# are skipped, and so are captures that cannot lift the static score to alpha even with
+# QUIESCENCE_DELTA to spare. A side in check within QUIESCENCE_CHECK_PLIES plies of the horizon
+# tries every evasion instead of standing pat; QUIESCENCE_MAX_PLY plies down the static score stands
+QUIESCENCE = True
+QUIESCENCE_DELTA = 200
+QUIESCENCE_MAX_PLY = 6
+QUIESCENCE_CHECK_PLIES = 1
+
+# df-pn mate solver (extension/dfpn.py) before every search: a proven forced win is played
+# at once. It gets MATE_SOLVER_SHARE of the move's time, at most MATE_SOLVER_SECONDS, and is
+# skipped when that is under MATE_SOLVER_MIN_SECONDS. Every df-pn node generates its legal
+# moves, so its clock is read every MATE_SOLVER_CHECK_EVERY nodes rather than every 1024
+MATE_SOLVER = True
+MATE_SOLVER_SHARE = 0.1
+MATE_SOLVER_SECONDS = 3.0
+MATE_SOLVER_MIN_SECONDS = 0.05
+MATE_SOLVER_CHECK_EVERY = 4
+
+# endgame tables from generate_tablebases.py, memory-mapped once at import; empty if none were generated
+TABLEBASES = load_tablebases()
+
+# PIECE_VALUES indexed by FastBoard piece type
+TYPE_VALUES = [0] * (TYPE_MASK + 1)
+for _piece_type, _name in PIECE_NAMES.items():
+    TYPE_VALUES[_piece_type] = PIECE_VALUES[_name]
+
+
+# Search helpers. search_position() converts the chessmaker Board to a FastBoard once and
+# searches it with make/unmake: endgame tables, then the mate solver, then iterative deepening
+# over negamax, which uses the table helpers and terminal scores below
+
+def score_to_tt(score, depth):
+    """Mate scores carry the remaining depth, so store them relative to this node."""
+    if score >= MATE_BOUND:
+        return score - depth
+    if score <= -MATE_BOUND:
+        return score + depth
+    return score
+
 
+def score_from_tt(score, depth):
+    # a stored mate score is WIN_SCORE minus the plies to mate, so compare against the bound
+    if score >= MATE_BOUND:
+        return score + depth
+    if score <= -MATE_BOUND:
+        return score - depth
+    return score
 
-# Custom Helper Function in agent.py (used in the template I provided)
 
-def get_terminal_score(board, depth, root_player):
+def probe_tt(tt, board, depth, alpha, beta, stats=None):
+    """
+    Looks the node up in the transposition table.
+    Returns (score, alpha, beta, tt_move); score is not None if the stored
+    bound is deep enough to cut the node off.
+    """
+    if tt is None:
+        return None, alpha, beta, None
+    entry = tt.probe(board.key())
+    if stats is not None:
+        stats.tt_probes += 1
+    if entry is None:
+        return None, alpha, beta, None
+    if stats is not None:
+        stats.tt_hits += 1
+
+    tt_depth, tt_score, bound, tt_move = entry
+    if tt_depth >= depth:
+        tt_score = score_from_tt(tt_score, depth)
+        if bound == LOWER:
+            alpha = max(alpha, tt_score)
+        elif bound == UPPER:
+            beta = min(beta, tt_score)
+        if bound == EXACT or alpha >= beta:
+            if stats is not None:
+                stats.tt_cutoffs += 1
+            return tt_score, alpha, beta, tt_move
+    return None, alpha, beta, tt_move
+
+
+def store_tt(tt, board, depth, v, alpha_orig, beta_orig, best_move):
+    if tt is None:
+        return
+    if v <= alpha_orig:
+        bound = UPPER
+    elif v >= beta_orig:
+        bound = LOWER
+    else:
+        bound = EXACT
+    tt.store(board.key(), depth, score_to_tt(v, depth), bound, best_move)
+
+
+def order_moves(legal_moves, board, tt_move, ordering=None):
+    """
+    With a MoveOrdering: TT move, captures/promotions by MVV-LVA, killers,
+    counter move, then quiet moves by history. Without: MVV-LVA with the
+    transposition table move tried first.
+    """
+    if ordering is not None:
+        ordering.sort(legal_moves, board, tt_move)
+        return
+    legal_moves.sort(key=lambda x: get_mvvlva_score(x, board), reverse=True)
+    if tt_move is not None and tt_move in legal_moves:
+        legal_moves.remove(tt_move)
+        legal_moves.insert(0, tt_move)
+
+
+def get_terminal_score(board, depth, root_player, legal_moves=None):
     """Checks for terminal state and returns score relative to 'root_player'.
     taking away the depth from the score ensures that if there is a guaranteed mate, the algorithm will prefer the quickest mate
-
+    'legal_moves' lets a node reuse the moves it already generated for its search loop.
     """
 
-    game_result = get_result(board)
+    return result_score(board, board.get_result(legal_moves), depth, root_player)
+
+
+def result_score(board, game_result, depth, root_player):
+    """Score relative to 'root_player' of a FastBoard result string, or None for no result."""
     if game_result:
 
-        if "Checkmate" in game_result or "no kings" in game_result:
+        if game_result == CHECKMATE or game_result == NO_KINGS:
             # If the current player (who is now to move) is the one who lost the King,
             # or was mated, the score for the root_player is negative (a loss).
-            if board.current_player == root_player:
+            if board.side == root_player:
                 return -(WIN_SCORE + depth)  # depth is the remaining depth
             else:
                 # The root_player won the game
                 return (WIN_SCORE + depth)
 
-        if "Stalemate" in game_result:
-            if board.current_player == root_player:
+        if game_result == STALEMATE:
+            if board.side == root_player:
                 # Root player loses by stalemate
                 return LOSS_SCORE
             else:
                 # Root player wins by opponent's stalemate
                 return - LOSS_SCORE  # A positive score!
 
-        if "Draw" in game_result or "only 2 kings" in game_result:
+        if game_result == FIVEFOLD or game_result == ONLY_2_KINGS:
             return DRAW_SCORE
 
     return None
 
 
-def min_value(board, depth, alpha, beta, root_player):
+def tablebase_score(board, depth):
     """
-    Finds the minimum score for the minimizing player (Opponent).
-    The score is returned from the 'root_player's' perspective.
-
-    Args:
-        board (Board): The current board state.
-        depth (int): Remaining search depth.
-        alpha (float): The best score found so far for the MAX player (Agent).
-        beta (float): The best score found so far for the MIN player (Opponent).
-        root_player (Player): The player whose perspective the final score must be calculated from.
+    Exact score for the side to move from the endgame tables, or None.
+    A win in 'dtm' plies scores like a mate found 'dtm' plies further down.
+    """
+    entry = TABLEBASES.probe(board)
+    if entry is None:
+        return None
+    result, dtm = entry
+    if result == WIN:
+        return WIN_SCORE + depth - dtm
+    if result == LOSS:
+        return -(WIN_SCORE + depth - dtm)
+    return DRAW_SCORE
+
+
+def tablebase_move(position, legal_moves):
     """
+    The move the endgame tables pick: the fastest win, else a draw, else the
+    slowest loss. None if the position or any move's result is not in a table.
+    """
+    if TABLEBASES.probe(position) is None:
+        return None
+    best_move = None
+    best_key = None
+    for move in legal_moves:
+        position.make(move)
+        entry = TABLEBASES.probe(position)
+        position.unmake()
+        if entry is None:
+            return None
+        result, dtm = entry
+        # the entry is from the opponent's side
+        if result == LOSS:
+            key = (2, -dtm)
+        elif result == WIN:
+            key = (0, dtm)
+        else:
+            key = (1, 0)
+        if best_key is None or key > best_key:
+            best_move, best_key = move, key
+    return best_move
 
-    # returns ends score if it has ended
-    terminal_score = get_terminal_score(board, depth, root_player)
-    if terminal_score is not None:
-        return terminal_score
 
-    if depth == 0:
-        return evaluate(board, root_player)
+def in_check(board, side):
+    """True if 'side' has a king and it is attacked; pins ignored, as in FastBoard.is_attacked."""
+    king = board.kings[side]
+    return king != -1 and board.is_attacked(king, side ^ 1)
 
-    # the thing we're trying to minimise so it has to start as a high value
-    v = 99999999999
 
-    # Get legal moves for the current player (who is MIN)
-    legal_moves = list_legal_moves_for(board, board.current_player)
+def null_move_allowed(board):
+    """
+    Zugzwang guard for null-move pruning: the side to move needs a piece
+    other than pawns and its king, and the board at least NULL_MOVE_MIN_PIECES.
+    """
+    if board.occ.bit_count() < NULL_MOVE_MIN_PIECES:
+        return False
+    own = BLACK_BIT if board.side else 0
+    for code in board.board:
+        if code and code & BLACK_BIT == own and code & TYPE_MASK not in (PAWN, KING):
+            return True
+    return False
 
-    legal_moves.sort(key=lambda x: get_mvvlva_score(x, board), reverse=True)
-    # random.shuffle(legal_moves)
 
-    for piece_to_move, move_opt in legal_moves:
+def negamax(board, depth, alpha, beta, ctx, null_ok=True):
+    """
+    Principal variation search in negamax form: the score is always from the
+    point of view of the side to move, so one function serves both players.
+    The first move is searched with the full window; the rest get a null
+    window (alpha, alpha + 1) and are re-searched only if they fail high.
+
+    Args:
+        board (FastBoard): The current board state.
+        depth (int): Remaining search depth.
+        alpha (int): Lower bound for the side to move.
+        beta (int): Upper bound for the side to move.
+        ctx (SearchContext): Transposition table, deadline and move ordering for this search.
+        null_ok (bool): False right after a null move, so two passes never follow each other.
+    """
 
-        temp_board = board.clone()
-        temp_board, moved_piece, applied_move = copy_piece_move(
-            temp_board, piece_to_move, move_opt)
+    ctx.control.tick()
+    stats = ctx.stats
 
-        if moved_piece and applied_move:
-            moved_piece.move(applied_move)
+    if board.occ.bit_count() <= TABLEBASES.max_pieces:
+        tb_score = tablebase_score(board, depth)
+        if tb_score is not None:
+            stats.tablebase_hits += 1
+            return tb_score
 
-            score = max_value(temp_board, depth - 1, alpha, beta, root_player)
+    if depth == 0:
+        stats.leaf_nodes += 1
+        # returns ends score if it has ended
+        started = perf_counter()
+        terminal_score = get_terminal_score(board, depth, board.side)
+        stats.result_seconds += perf_counter() - started
+        if terminal_score is not None:
+            stats.terminal_nodes += 1
+            return terminal_score
+        if QUIESCENCE:
+            return quiescence(board, alpha, beta, ctx, 0)
+        started = perf_counter()
+        v = evaluate(board, board.side)
+        stats.eval_seconds += perf_counter() - started
+        return v
+
+    # checkmate and stalemate wait until the move loop finds no legal move
+    started = perf_counter()
+    terminal_score = result_score(board, board.quick_result(), depth, board.side)
+    stats.result_seconds += perf_counter() - started
+    if terminal_score is not None:
+        stats.terminal_nodes += 1
+        return terminal_score
 
-            v = min(v, score)
-            beta = min(beta, v)
+    alpha_orig, beta_orig = alpha, beta
+    tt_score, alpha, beta, tt_move = probe_tt(ctx.tt, board, depth, alpha, beta, stats)
+    if tt_score is not None:
+        return tt_score
+
+    if depth == 1 and BATCH_FRONTIER and not QUIESCENCE:
+        # the batch scores every child, so legality is tested up front here
+        started = perf_counter()
+        legal_moves = board.legal_moves()
+        stats.movegen_seconds += perf_counter() - started
+        if not legal_moves:
+            stats.terminal_nodes += 1
+            return result_score(board, board.no_move_result(), depth, board.side)
+        v, best_move = search_frontier(board, legal_moves, alpha, beta, ctx)
+        store_tt(ctx.tt, board, depth, v, alpha_orig, beta_orig, best_move)
+        return v
+
+    pv_node = beta - alpha > 1
+    checked = depth >= min(NULL_MOVE_MIN_DEPTH, LMR_MIN_DEPTH) and in_check(board, board.side)
+
+    # has_legal_move(): a stalemated side must not pass its way out of its loss
+    if (NULL_MOVE and null_ok and not pv_node and not checked and depth >= NULL_MOVE_MIN_DEPTH
+            and beta < -LOSS_SCORE and null_move_allowed(board) and board.has_legal_move()):
+        reduction = NULL_MOVE_REDUCTION + depth // 4
+        board.make_null()
+        score = -negamax(board, max(0, depth - 1 - reduction), -beta, -beta + 1, ctx, False)
+        board.unmake_null()
+        if score >= beta:
+            stats.null_cutoffs += 1
+            # a mate or stalemate found after passing is not a result this position can claim
+            return beta if score >= -LOSS_SCORE else score
+
+    reduce_late = LMR and depth >= LMR_MIN_DEPTH and not checked and ctx.ordering is not None
+
+    v = -INFINITY
+    best_move = None
+
+    # pseudo-legal moves: legality is only tested for the moves a cutoff does not skip
+    started = perf_counter()
+    moves = board.pseudo_moves()
+    stats.movegen_seconds += perf_counter() - started
+    order_moves(moves, board, tt_move, ctx.ordering)
+
+    index = 0  # legal moves searched so far
+    for move in moves:
+
+        board.make(move)
+        if board.king_exposed():
+            board.unmake()
+            stats.illegal_moves += 1
+            continue
+
+        reduction = 0
+        if reduce_late and index >= LMR_MIN_MOVES and ctx.ordering.is_quiet(move):
+            reduction = 2 if index >= 2 * LMR_MIN_MOVES and depth >= 5 else 1
+        if reduction and in_check(board, board.side):
+            # checking moves keep their full depth
+            reduction = 0
+        if index == 0:
+            score = -negamax(board, depth - 1, -beta, -alpha, ctx)
+        else:
+            score = alpha + 1
+            if reduction:
+                stats.reductions += 1
+                score = -negamax(board, depth - 1 - reduction, -alpha - 1, -alpha, ctx)
+                if score > alpha:
+                    stats.reduction_researches += 1
+            if score > alpha:
+                score = -negamax(board, depth - 1, -alpha - 1, -alpha, ctx)
+                if alpha < score < beta:
+                    # the null window failed high: this move may be the new best, search it properly
+                    score = -negamax(board, depth - 1, -beta, -alpha, ctx)
+        board.unmake()
+
+        if score > v:
+            v = score
+            best_move = move
+
+        alpha = max(alpha, v)
+        if alpha >= beta:
+            stats.beta_cutoffs += 1
+            if index == 0:
+                stats.first_move_cutoffs += 1
+            if ctx.ordering is not None:
+                ctx.ordering.record_cutoff(board, move, depth, index)
+            break
+        index += 1
 
-            # ignores the branch if alpha >= beta
-            if alpha >= beta:
-                break
+    if best_move is None:
+        stats.terminal_nodes += 1
+        return result_score(board, board.no_move_result(), depth, board.side)
 
+    store_tt(ctx.tt, board, depth, v, alpha_orig, beta_orig, best_move)
     return v
 
 
-def max_value(board, depth, alpha, beta, root_player):
-    """
-    Finds the maximum score for the maximizing player (Agent).
-    The score is returned from the 'root_player's' perspective.
+def tactical_value(move, board):
+    """Most material 'move' can win: the piece it takes plus a promotion's gain."""
+    value = 0
+    if move & CAPTURE:
+        # en passant is the only capture onto an empty square
+        value = TYPE_VALUES[(board.board[move_squares(move)[1]] or PAWN) & TYPE_MASK]
+    if move & PROMOTION:
+        value += PROMOTION_GAIN
+    return value
 
-    Args:
-        board (Board): The current board state.
-        depth (int): Remaining search depth.
-        alpha (float): The best score found so far for the MAX player (Agent).
-        beta (float): The best score found so far for the MIN player (Opponent).
-        root_player (Player): The player whose perspective the final score must be calculated from.
-    """
 
-    # returns ends score if it has ended
-    terminal_score = get_terminal_score(board, depth, root_player)
-    if terminal_score is not None:
-        return terminal_score
+def quiescence(board, alpha, beta, ctx, qply):
+    """
+    Capture and promotion search below the horizon, fail-soft like negamax.
+    The side to move may stand pat on its static score unless it is in check,
+    when every evasion is tried and no legal one means checkmate. negamax has
+    already checked the horizon node for a finished game; further down only
+    the results that need no move generation are, so a stalemate reached by
+    a capture is scored statically.
+    """
+    stats = ctx.stats
+    if qply:
+        ctx.control.tick()
+        stats.quiescence_nodes += 1
+
+        if board.occ.bit_count() <= TABLEBASES.max_pieces:
+            tb_score = tablebase_score(board, 0)
+            if tb_score is not None:
+                stats.tablebase_hits += 1
+                return tb_score
+
+        started = perf_counter()
+        terminal_score = result_score(board, board.quick_result(), 0, board.side)
+        stats.result_seconds += perf_counter() - started
+        if terminal_score is not None:
+            stats.terminal_nodes += 1
+            return terminal_score
+
+    started = perf_counter()
+    stand_pat = evaluate(board, board.side)
+    stats.eval_seconds += perf_counter() - started
+    checked = qply < QUIESCENCE_CHECK_PLIES and in_check(board, board.side)
+    if not checked:
+        if stand_pat >= beta or qply >= QUIESCENCE_MAX_PLY:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+    started = perf_counter()
+    moves = board.pseudo_moves()
+    stats.movegen_seconds += perf_counter() - started
+    if not checked:
+        moves = [move for move in moves if move & TACTICAL]
+    sort_tactical(moves, board)
+
+    v = -INFINITY if checked else stand_pat
+    searched = 0
+    for move in moves:
+        if not checked:
+            if stand_pat + tactical_value(move, board) + QUIESCENCE_DELTA <= alpha:
+                stats.delta_prunes += 1
+                continue
+            if see(board, move) < 0:
+                stats.see_prunes += 1
+                continue
 
-    if depth == 0:
-        return evaluate(board, root_player)
+        board.make(move)
+        if board.king_exposed():
+            board.unmake()
+            stats.illegal_moves += 1
+            continue
+        score = -quiescence(board, -beta, -alpha, ctx, qply + 1)
+        board.unmake()
+        searched += 1
+
+        if score > v:
+            v = score
+        alpha = max(alpha, v)
+        if alpha >= beta:
+            stats.beta_cutoffs += 1
+            break
 
-    # the thing we're trying to maximise has to start negative
-    v = -99999999999
+    if checked and not searched:
+        stats.terminal_nodes += 1
+        return result_score(board, board.no_move_result(), 0, board.side)
+    return v
 
-    # get all legal moves for the current player (who is MAX)
-    legal_moves = list_legal_moves_for(board, board.current_player)
 
-    legal_moves.sort(key=lambda x: get_mvvlva_score(x, board), reverse=True)
-    # random.shuffle(legal_moves)
+def search_frontier(board, legal_moves, alpha, beta, ctx):
+    """
+    negamax at depth 1, where every child is a leaf. The children's static
+    scores come from one evaluate_batch() call; the children are then visited
+    best score first for the checks a leaf makes (endgame tables, game over)
+    until one fails high. Returns (score, best move); the score is fail-soft
+    like negamax's and equal to it inside the window.
+    """
+    stats = ctx.stats
+    started = perf_counter()
+    scores = evaluate_batch(encode([board.child_cells(move) for move in legal_moves]))
+    stats.eval_seconds += perf_counter() - started
+    if board.side != WHITE:
+        scores = [-score for score in scores]
+
+    v = -INFINITY
+    best_move = None
+    order = sorted(range(len(legal_moves)), key=scores.__getitem__, reverse=True)
+
+    for index, i in enumerate(order):
+        move = legal_moves[i]
+        board.make(move)
+        ctx.control.tick()
+        child_score = None
+        if board.occ.bit_count() <= TABLEBASES.max_pieces:
+            child_score = tablebase_score(board, 0)
+            if child_score is not None:
+                stats.tablebase_hits += 1
+        if child_score is None:
+            stats.leaf_nodes += 1
+            started = perf_counter()
+            child_score = get_terminal_score(board, 0, board.side)
+            stats.result_seconds += perf_counter() - started
+            if child_score is not None:
+                stats.terminal_nodes += 1
+        board.unmake()
+        score = scores[i] if child_score is None else -child_score
+
+        if score > v:
+            v = score
+            best_move = move
+
+        alpha = max(alpha, v)
+        if alpha >= beta:
+            stats.beta_cutoffs += 1
+            if index == 0:
+                stats.first_move_cutoffs += 1
+            if ctx.ordering is not None:
+                ctx.ordering.record_cutoff(board, move, 1, index)
+            break
 
-    for piece_to_move, move_opt in legal_moves:
+    return v, best_move
 
-        # Try the move on a clone board
-        temp_board = board.clone()
-        # copy_piece_move ensures we get the piece/move objects linked to the clone
-        temp_board, moved_piece, applied_move = copy_piece_move(
-            temp_board, piece_to_move, move_opt)
 
-        if moved_piece and applied_move:
-            moved_piece.move(applied_move)
+def search_root(position, root_moves, depth, alpha, beta, ctx, partial):
+    """
+    PVS over the root moves. Returns (best score, best move). Every move that
+    raises alpha is written to 'partial' as [move, score] straight away, so an
+    aborted iteration still leaves its best finished move behind.
+    """
+    best_score = -INFINITY
+    best_move = None
 
-            score = min_value(temp_board, depth - 1, alpha, beta, root_player)
+    for index, move in enumerate(root_moves):
 
-            v = max(v, score)
+        ctx.control.check()
 
-            alpha = max(alpha, v)
-            if alpha >= beta:
-                break
+        position.make(move)
+        if index == 0:
+            score = -negamax(position, depth - 1, -beta, -alpha, ctx)
+        else:
+            score = -negamax(position, depth - 1, -alpha - 1, -alpha, ctx)
+            if alpha < score < beta:
+                score = -negamax(position, depth - 1, -beta, -alpha, ctx)
+        position.unmake()
+
+        if score > best_score:
+            best_score = score
+            best_move = move
+            if score > alpha:
+                partial[:] = [move, score]
+
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            break
 
-    return v
+    return best_score, best_move
 
 
 def evaluate(board, player):
     '''
-    Basic material-only evaluation. Currently based only on material values.
+    Material plus piece-square tables, which FastBoard keeps up to date in
+    make/unmake (evaluation.DEBUG checks them against a full recompute), plus
+    mobility when evaluation.MOBILITY is set. search_frontier() scores leaves
+    in batches with the same numbers.
     '''
-    score = 0
-    for piece in board.get_pieces():
-        value = PIECE_VALUES.get(piece.name, 0)
-        if piece.player == player:
-            score += value
-        else:
-            score -= value
-    return score
+    if evaluation.DEBUG:
+        evaluation.check_score(board)
+    score = board.score
+    if evaluation.MOBILITY:
+        score += mobility(board.board)
+    if player == WHITE:
+        return score
+    return -score
 
 
 def agent(board, player, var):
     '''
-    The agent uses Iterative Deepening, Alpha-Beta Pruning, MVV-LVA, and 
-    Principal Variation (PV) Ordering.
+    The agent uses Iterative Deepening, Principal Variation Search with
+    aspiration windows, a quiescence search with static exchange evaluation
+    at the horizon, a transposition table, MVV-LVA, killer/history
+    ordering and Principal Variation (PV) Ordering.
+    'var' sets the time budget for this move in seconds (see time_limit_for);
+    a dict 'var' may also set "workers" for a Lazy SMP search (see extension/parallel.py)
+    "depth" to stop after a fixed depth and "history", the game's
+    RepetitionHistory, so repetitions before this move count towards the
+    fivefold rule in the search (see history_for). Statistics for the move go to
+    STATS_SINKS and the "sinks" in 'var'; see search_position().
+    The table, ordering tables and PV carry over from move to move in a
+    Session (see session_for), so a search along the predicted line starts
+    several plies deep.
     '''
-    TIME_LIMIT = 30
-    ROOT_PLAYER = player
-    MAX_DEPTH = 1
+    return search_position(board, var)[0]
 
-    best_move = (None, None)
-    best_score = -99999999
 
-    legal_moves = list_legal_moves_for(board, player)
+def helper_search(position, ctx, depth_offset):
+    """
+    Lazy SMP helper: plain iterative deepening from the root, starting
+    'depth_offset' plies deeper, until ctx.control aborts it. Only the
+    entries it leaves in the shared table matter. Returns its node count.
+    """
+    depth = 1 + depth_offset
+    try:
+        while depth <= MAX_SEARCH_DEPTH:
+            negamax(position, depth, -INFINITY, INFINITY, ctx)
+            depth += 1
+    except SearchAborted:
+        pass
+    return ctx.control.nodes
+
+
+def search_position(board, var):
+    '''
+    The search behind agent(). Returns (best move, SearchStats) and hands
+    the stats to every sink in STATS_SINKS and in the "sinks" list of a dict
+    'var'. A dict 'var' with "profile" set runs this one move under cProfile
+    and keeps the summary in stats.profile.
+    With one worker (the default) the search runs in this process alone.
+    '''
+    if isinstance(var, dict) and var.get("profile"):
+        (best_move, stats), stats_profile = profiled(_search_position, board, var)
+        stats.profile = stats_profile
+    else:
+        best_move, stats = _search_position(board, var)
+
+    sinks = list(STATS_SINKS)
+    if isinstance(var, dict):
+        sinks += var.get("sinks", [])
+    for sink in sinks:
+        sink(stats)
+    return best_move, stats
+
+
+def session_for(var):
+    """
+    The Session for one agent() call: the "session" entry of a dict 'var',
+    a throwaway one if that is False, else the one this module keeps.
+    """
+    global _session
+    if isinstance(var, dict) and "session" in var:
+        return var["session"] or Session(TT_SIZE_MB)
+    if _session is None:
+        _session = Session(TT_SIZE_MB)
+    return _session
+
+
+def _search_position(board, var):
+    # the search runs on a FastBoard; chessmaker objects are only used at the root
+    position = FastBoard.from_board(board, history_for(var))
+    best_move, stats = search_fast_board(position, var)
+    if best_move is None:
+        return (None, None), stats
+    return position.to_piece_move(board, best_move), stats
+
+
+def mate_time_for(var, time_limit):
+    """
+    Seconds for the mate solver before the main search: MATE_SOLVER_SHARE of
+    the move's time, at most MATE_SOLVER_SECONDS, and none at all when that
+    is under MATE_SOLVER_MIN_SECONDS. A dict 'var' may set "mate" to False or
+    to a number of seconds; fixed-depth searches skip the solver unless
+    "mate" asks for it.
+    """
+    if isinstance(var, dict) and "mate" in var:
+        return float(var["mate"] or 0)
+    if not MATE_SOLVER or depth_limit_for(var) is not None:
+        return 0.0
+    seconds = min(time_limit * MATE_SOLVER_SHARE, MATE_SOLVER_SECONDS)
+    return seconds if seconds >= MATE_SOLVER_MIN_SECONDS else 0.0
+
+
+def search_fast_board(position, var):
+    """
+    The search behind agent() on a FastBoard, for callers that keep their
+    game as one (engine_server.py). Returns (best move or None, SearchStats);
+    no sinks are called. A dict 'var' may carry a "stop" event (threading or
+    multiprocessing) that ends the search early, as if its time had run out.
+    """
+    TIME_LIMIT = time_limit_for(var)
+    workers = workers_for(var)
+    max_depth = depth_limit_for(var, MAX_SEARCH_DEPTH)
+    pondering = var.get("ponder", PONDER) if isinstance(var, dict) else PONDER
+    stop = var.get("stop") if isinstance(var, dict) else None
+    session = session_for(var)
+    throwaway = isinstance(var, dict) and var.get("session") is False
+    started = perf_counter()
+    stats = SearchStats()
+
+    # the opponent has moved: the ponder search is over either way, its table entries stay
+    resume = None
+    if pondering and session.ponder is not None:
+        stats.ponder = "hit" if session.ponder.key == position.key() else "miss"
+        resume = stop_pondering(session, position.key())
+
+    legal_moves = position.legal_moves()
 
     if not legal_moves:
-        return None, None
+        return None, stats
+
+    # a position in the endgame tables needs no search
+    tb_move = tablebase_move(position, legal_moves)
+    if tb_move is not None:
+        stats.tablebase_hits += 1
+        stats.score = tablebase_score(position, 0)
+        stats.best_move = move_text(tb_move)
+        stats.seconds = perf_counter() - started
+        return tb_move, stats
+
+    # a forced win the mate solver proves is played straight away, with its line
+    mate_seconds = mate_time_for(var, TIME_LIMIT)
+    if mate_seconds:
+        mate_control = SearchController(mate_seconds, margin=1.0, stop=stop,
+                                        check_every=MATE_SOLVER_CHECK_EVERY)
+        line = solve_mate(position, session.mate_table(), mate_control)
+        stats.mate_nodes = mate_control.nodes
+        if line:
+            session.pv = array("H", line)
+            stats.mate_plies = len(line)
+            stats.score = WIN_SCORE
+            stats.best_move = move_text(line[0])
+            stats.pv = [move_text(move) for move in line]
+            stats.seconds = perf_counter() - started
+            return line[0], stats
+        # the main search keeps at least the budget less the solver's slice
+        TIME_LIMIT -= min(mate_control.elapsed(), mate_seconds)
+
+    session.start_search(position)
+    control = SearchController(TIME_LIMIT, stop=stop)
+    tt = session.table(shared=pondering or workers > 1)
+
+    # an exact root entry left by the previous search (usually along its PV) counts as searched already
+    entry = tt.probe(position.key())
+    if entry is not None and entry[2] == EXACT and entry[0] > 0 and entry[3] in legal_moves:
+        depth, score, _, move = entry
+        if resume is None or depth > resume[0]:
+            resume = (depth, move, score_from_tt(score, depth))
+
+    helpers = HelperGroup(helper_search, position, tt, workers - 1, control.deadline) if workers > 1 else None
+    ctx = SearchContext(tt, control, session.ordering, stats)
+
+    try:
+        best_move, best_score, completed = iterative_deepening(position, legal_moves, ctx, max_depth, resume)
+    finally:
+        if helpers is not None:
+            stats.helper_nodes = helpers.stop()
+
+    session.pv = array("H", principal_variation(position, best_move, tt, max(completed, 1)))
+    if pondering:
+        start_pondering(session, position)
+    if throwaway:
+        session.close()
+
+    stats.depth = completed
+    stats.score = best_score
+    stats.best_move = move_text(best_move)
+    stats.pv = [move_text(move) for move in session.pv]
+    stats.nodes = control.nodes
+    stats.iterations = control.iterations
+    stats.seconds = perf_counter() - started
+    return best_move, stats
+
+
+def principal_variation(position, move, tt, length):
+    """'move' and the best moves the table holds after it, up to 'length' moves in all."""
+    pv = []
+    while move is not None and len(pv) < length:
+        position.make(move)
+        pv.append(move)
+        entry = tt.probe(position.key())
+        move = entry[3] if entry is not None else None
+        if move is not None and (position.get_result() is not None or move not in position.legal_moves()):
+            move = None
+    for _ in pv:
+        position.unmake()
+    return pv
+
+
+def ponder_search(position, ctx):
+    """PonderSearch target: deepens until stopped. Returns (nodes, depth, encoded best move, score)."""
+    best_move, best_score, completed = iterative_deepening(position, position.legal_moves(), ctx)
+    if not completed:
+        return ctx.control.nodes, 0, encode_move(None), 0
+    return ctx.control.nodes, completed, encode_move(best_move), best_score
+
+
+def start_pondering(session, position):
+    """
+    Plays the first two moves of the session's PV, our move and the
+    opponent's expected reply, and searches the position after them in a
+    background process until the next agent() call.
+    """
+    if len(session.pv) < 2:
+        return
+    position.make(session.pv[0])
+    position.make(session.pv[1])
+    if position.get_result() is None:
+        session.ponder = PonderSearch(ponder_search, position, session.tt, PONDER_TIME_LIMIT)
+    position.unmake()
+    position.unmake()
 
-    start_time_total = time.time()
 
-    legal_moves.sort(key=lambda x: get_mvvlva_score(x, board), reverse=True)
+def stop_pondering(session, key=None):
+    """
+    Stops the session's ponder search, if one is running. Returns its
+    (depth, move, score) when it was searching the position with 'key' and
+    finished at least one iteration, so the search there can carry on from it.
+    """
+    stopped = session.stop_pondering()
+    if stopped is None:
+        return None
+    ponder, (_, depth, move, score) = stopped
+    if ponder.key != key or depth == 0:
+        return None
+    return depth, decode_move(move), score
+
+
+@atexit.register
+def _close_session():
+    if _session is not None:
+        _session.close()
+
+
+def iterative_deepening(position, legal_moves, ctx, max_depth=MAX_SEARCH_DEPTH, resume=None):
+    """
+    Deepens the search until time runs out. Returns (best move, score, last completed depth).
+    'resume' is a (depth, move, score) already searched for this position, e.g. by a ponder search;
+    the iterations start just above it.
+    """
+    MAX_DEPTH = 1
+    best_move = None
+    best_score = -INFINITY
+    root_ply = position.ply
+
+    legal_moves.sort(key=lambda x: get_mvvlva_score(x, position), reverse=True)
 
     pv_move = None
 
-    while True:
+    if resume is not None and resume[1] in legal_moves:
+        completed, best_move, best_score = resume
+        pv_move = best_move
+        MAX_DEPTH = completed + 1
+
+    while MAX_DEPTH <= max_depth:
 
-        if time.time() - start_time_total > TIME_LIMIT * 0.98:
+        # skip an iteration the branching factor says cannot finish in time
+        if best_move is not None and not ctx.control.should_start_iteration():
             break
 
         root_moves = list(legal_moves)
@@ -207,62 +907,67 @@ def agent(board, player, var):
                 # If the move isn't legal anymore
                 pv_move = None
 
-        # TEMPORARY: Print the order of the first 5 moves for the current depth
-        print(f"Depth {MAX_DEPTH} Root Move Order:")
-        for i, (piece, move_opt) in enumerate(root_moves[:5]):
-            start_pos = f"{piece.position.x},{piece.position.y}"
-            end_pos = f"{move_opt.position.x},{move_opt.position.y}"
-            print(f"  {i+1}: {piece.name} from {start_pos} to {end_pos}")
-        print("-" * 20)
-        # END TEMPORARY CODE
-
-        current_best_move = (None, None)
-        current_best_score = -999999999
-
-        for piece_to_move, move_opt in root_moves:
-
-            if time.time() - start_time_total > TIME_LIMIT * 0.95:
-                # return previous best move if time runs out
-                return best_move
-
-            # applies the move on a clone board
-            temp_board = board.clone()
-            temp_board, moved_piece, applied_move = copy_piece_move(
-                temp_board, piece_to_move, move_opt)
-
-            if not (moved_piece and applied_move):
-                continue
-
-            # move the piece if its a valid move
-            moved_piece.move(applied_move)
+        # aspiration window around the previous score; mate and stalemate scores get the full window
+        if MAX_DEPTH > 1 and abs(best_score) < -LOSS_SCORE:
+            alpha, beta = best_score - ASPIRATION_WINDOW, best_score + ASPIRATION_WINDOW
+        else:
+            alpha, beta = -INFINITY, INFINITY
+        delta = ASPIRATION_WINDOW
 
-            # The next state is the opponent's turn.
-            current_score = min_value(
-                board=temp_board,
-                depth=MAX_DEPTH - 1,
-                alpha=-999999999,  # Use MIN_VAL constant
-                beta=999999999,  # Use MAX_VAL constant
-                root_player=ROOT_PLAYER
-            )
+        ctx.control.start_iteration()
+        partial = []
 
-            if current_score > current_best_score:
-                current_best_score = current_score
-                current_best_move = (piece_to_move, move_opt)
+        try:
+            while True:
+                partial = []
+                current_best_score, current_best_move = search_root(
+                    position, root_moves, MAX_DEPTH, alpha, beta, ctx, partial)
+
+                if current_best_score <= alpha and alpha > -INFINITY:
+                    # failed low: every move is worse than expected, widen downwards
+                    delta *= 4
+                    alpha = max(current_best_score - delta, -INFINITY)
+                elif current_best_score >= beta and beta < INFINITY:
+                    # failed high: search the refuting move first with a wider window
+                    delta *= 4
+                    beta = min(current_best_score + delta, INFINITY)
+                    root_moves.remove(current_best_move)
+                    root_moves.insert(0, current_best_move)
+                else:
+                    break
+
+        except SearchAborted:
+            # the deadline hit inside the tree; put the board back to the root
+            position.unwind(root_ply)
+            # the previous best move is searched first, so a move that raised
+            # alpha in this partial iteration is at least as good as it at this depth
+            if partial:
+                best_move = partial[0]
+                best_score = partial[1]
+            logger.debug("Search stopped during depth %d after %.2f seconds", MAX_DEPTH, ctx.control.elapsed())
+            break
 
-                pv_move = current_best_move
+        ctx.control.finish_iteration(MAX_DEPTH)
 
-        if current_best_move != (None, None):
+        if current_best_move is not None:
+            pv_move = current_best_move
             best_move = current_best_move
             best_score = current_best_score
+            ctx.tt.store(position.key(), MAX_DEPTH, score_to_tt(best_score, MAX_DEPTH), EXACT, current_best_move)
 
-            print(
-                f"Completed search to Depth {MAX_DEPTH}. Best score: {best_score}. Took {time.time()-start_time_total:.2f} seconds")
+            logger.debug("Completed depth %d: best %s, score %d, %.2f seconds, first-move cutoffs %.0f%%",
+                         MAX_DEPTH, move_text(best_move), best_score, ctx.control.elapsed(),
+                         ctx.ordering.first_move_cutoff_rate() * 100)
 
             MAX_DEPTH += 1
         else:
             break
 
-    return best_move
+    if best_move is None:
+        # out of time before depth 1 finished: fall back to the best-ordered move
+        best_move = legal_moves[0]
+
+    return best_move, best_score, MAX_DEPTH - 1
 
 
 def human_player(board, player, var):
@@ -307,30 +1012,21 @@ def human_player(board, player, var):
     return None, None
 
 
-def get_mvvlva_score(piece_move_pair, board):
+def get_mvvlva_score(move, board):
     """
     Calculates the MVV-LVA score for a single move using PIECE_VALUES. 
     A multiplier is used to ensure all captures are scored > 0.
     """
-    piece, move_opt = piece_move_pair
-
-    captured_pieces = getattr(move_opt, "captures", [])
-
-    if not captured_pieces:
+    if not move & CAPTURE:
         return 0
+    frm, to = move_squares(move)
 
-    victim_value = 0
-
-    for victim_pos in captured_pieces:
-
-        cell = board[victim_pos]
-        victim_piece = cell.piece
-
-        if victim_piece:
-            value = PIECE_VALUES.get(victim_piece.name, 100)
+    attacker = board.board[frm]
+    # en passant is the only capture onto an empty square
+    victim = board.board[to] or PAWN
 
-            victim_value = max(victim_value, value * 10)
+    victim_value = TYPE_VALUES[victim & TYPE_MASK] * 10
 
-    attacker_value = PIECE_VALUES.get(piece.name, 100)
+    attacker_value = TYPE_VALUES[attacker & TYPE_MASK]
 
     return victim_value - attacker_value
@@ -0,0 +1,191 @@
+# Python 3.11+
+"""
+Benchmarks for move generation and search over the samples.py positions
+(sample_boards.POSITIONS).
+
+    python bench.py perft [--depth 4]
+    python bench.py search [--depth 6]
+    python bench.py parallel [--seconds 5] [--max-workers 4]
+    python bench.py positions [--count 100000]
+    python bench.py all
+
+perft counts leaf nodes with FastBoard (see perft.py) and records
+nodes/sec. search runs a fixed-depth search and records nodes/sec, the
+time to reach every depth and the chosen move. Every search starts from
+an empty table (a throwaway Session). parallel runs a fixed-time
+search with 1, 2, ... workers and records nodes/sec of the main search
+plus its Lazy SMP helpers, with the mate solver off. positions writes
+--count positions from random games to a position file
+(extension/position_file.py) and records positions/sec for each way of
+reading them back. all runs the four suites in that order, with the same
+options.
+
+--json saves the results; --baseline compares them with an earlier file
+and exits non-zero when a perft count or best move changed, or when
+throughput dropped by more than --tolerance.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+
+from agent import search_position
+from extension.fast_board import FastBoard
+from extension.mcts import make_random_move
+from extension.position_file import PositionFile, write_positions
+from perft import perft, timed
+from sample_boards import POSITIONS, make_custom_board
+
+
+def bench_perft(depth):
+    rows = []
+    for name, sample in POSITIONS.items():
+        board, _ = make_custom_board(sample)
+        nodes, seconds = timed(perft, FastBoard.from_board(board), depth)
+        rows.append({"position": name, "depth": depth, "nodes": nodes, "seconds": round(seconds, 4),
+                     "nodes_per_second": round(nodes / seconds)})
+    return rows
+
+
+def bench_search(depth, time_limit=3600):
+    rows = []
+    for name, sample in POSITIONS.items():
+        board, _ = make_custom_board(sample)
+        _, stats = search_position(board, {"depth": depth, "time_limit": time_limit, "session": False})
+        time_to_depth = {}
+        elapsed = 0.0
+        for iteration_depth, _, seconds in stats.iterations:
+            elapsed += seconds
+            time_to_depth[str(iteration_depth)] = round(elapsed, 4)
+        rows.append({"position": name, "depth": stats.depth, "best_move": stats.best_move,
+                     "score": stats.score, "nodes": stats.nodes, "seconds": round(stats.seconds, 4),
+                     "nodes_per_second": round(stats.nodes / max(stats.seconds, 1e-9)),
+                     "time_to_depth": time_to_depth})
+    return rows
+
+
+def bench_parallel(seconds, max_workers):
+    rows = []
+    for name, sample in POSITIONS.items():
+        for workers in range(1, max_workers + 1):
+            board, _ = make_custom_board(sample)
+            # no mate solver: its nodes are not alpha-beta nodes and would dilute nodes/sec
+            _, stats = search_position(board, {"time_limit": seconds, "workers": workers, "session": False,
+                                               "mate": False})
+            nodes = stats.nodes + stats.helper_nodes
+            rows.append({"position": name, "workers": workers, "nodes": nodes, "depth": stats.depth,
+                         "seconds": round(stats.seconds, 4),
+                         "nodes_per_second": round(nodes / max(stats.seconds, 1e-9))})
+    return rows
+
+
+def random_positions(count, seed=0):
+    """'count' positions from random games out of the samples.py positions, FastBoard cells copied."""
+    rng = random.Random(seed)
+    starts = [FastBoard.from_board(make_custom_board(sample)[0]) for sample in POSITIONS.values()]
+    position = None
+    for _ in range(count):
+        if position is None or position.quick_result() or make_random_move(position, rng) is None:
+            position = rng.choice(starts).copy()
+        yield list(position.board), position.side, position.ep
+
+
+def bench_positions(count):
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "positions.bin")
+        positions = list(random_positions(count))
+        _, seconds = timed(write_positions, path, positions)
+        rows.append({"position": "write", "count": count, "seconds": round(seconds, 4)})
+        with PositionFile(path) as corpus:
+            readers = {"cells": lambda: sum(1 for _ in corpus.iter_cells()),
+                       "fast_board": lambda: sum(1 for _ in corpus),
+                       "board": lambda: sum(1 for i in range(min(count, 1000)) if corpus.board(i))}
+            try:
+                corpus.code_array(0, 1)
+                readers["code_array"] = lambda: len(corpus.code_array())
+            except RuntimeError:
+                pass  # no numpy
+            for name, read in readers.items():
+                read_count, seconds = timed(read)
+                rows.append({"position": name, "count": read_count, "seconds": round(seconds, 4)})
+    for row in rows:
+        row["nodes_per_second"] = round(row["count"] / max(row["seconds"], 1e-9))
+    return rows
+
+
+def compare(results, baseline, tolerance):
+    """Differences from an earlier run that look like regressions, as printable lines."""
+    problems = []
+    for suite, rows in results.items():
+        if suite not in baseline or not isinstance(rows, list):
+            continue
+        key_fields = ("position", "depth", "workers")
+        old_rows = {tuple(row.get(k) for k in key_fields): row for row in baseline[suite]}
+        for row in rows:
+            old = old_rows.get(tuple(row.get(k) for k in key_fields))
+            if old is None:
+                continue
+            label = f"{suite} {row['position']} depth {row.get('depth')}"
+            if suite == "perft" and row["nodes"] != old["nodes"]:
+                problems.append(f"{label}: perft {old['nodes']} -> {row['nodes']}")
+            if suite == "search" and row["best_move"] != old["best_move"]:
+                problems.append(f"{label}: best move {old['best_move']} -> {row['best_move']}")
+            if row["nodes_per_second"] < old["nodes_per_second"] * (1 - tolerance):
+                problems.append(f"{label}: {old['nodes_per_second']} -> {row['nodes_per_second']} nodes/s")
+    return problems
+
+
+def _print_rows(suite, rows):
+    print(f"== {suite} ==")
+    for row in rows:
+        print("  " + ", ".join(f"{k}={v}" for k, v in row.items() if k != "time_to_depth"))
+        if row.get("time_to_depth"):
+            print("    time to depth: " + ", ".join(f"{d}: {s}s" for d, s in row["time_to_depth"].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("suite", choices=["perft", "search", "parallel", "positions", "all"])
+    parser.add_argument("--depth", type=int, help="perft depth (default 4) or search depth (default 6)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="time per parallel search")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--count", type=int, default=100000, help="positions for the positions suite")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare with the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed nodes/sec drop (default 0.2)")
+    args = parser.parse_args()
+
+    results = {"python": platform.python_version(), "date": time.strftime("%Y-%m-%d %H:%M:%S")}
+    if args.suite in ("perft", "all"):
+        results["perft"] = bench_perft(args.depth or 4)
+    if args.suite in ("search", "all"):
+        results["search"] = bench_search(args.depth or 6)
+    if args.suite in ("parallel", "all"):
+        results["parallel"] = bench_parallel(args.seconds, args.max_workers)
+    if args.suite in ("positions", "all"):
+        results["positions"] = bench_positions(args.count)
+
+    for suite in ("perft", "search", "parallel", "positions"):
+        if suite in results:
+            _print_rows(suite, results[suite])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
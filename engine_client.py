@@ -0,0 +1,121 @@
+# Python 3.11+
+"""
+Latency benchmark for engine_server.py: starts the server as a child
+process and times requests over its stdin/stdout.
+
+    python engine_client.py [--requests 200] [--games 4] [--rounds 5]
+                            [--depth 3] [--threads 4] [--position startpos]
+
+Reports the time to the first readyok (start-up and imports), isready round
+trips (protocol overhead), and "position + go depth" round trips when
+--games games search at once. Every line is min, median, 95th percentile
+and max in milliseconds.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "engine_server.py")
+
+
+class EngineClient:
+    """Talks to one engine_server.py process; answers are routed to their game's queue by prefix."""
+
+    def __init__(self, process):
+        self.process = process
+        self.queues = {}
+        self.reader = asyncio.create_task(self._read())
+
+    @classmethod
+    async def start(cls, threads):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, SERVER, "--threads", str(threads),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
+        return cls(process)
+
+    def _queue(self, tag):
+        if tag not in self.queues:
+            self.queues[tag] = asyncio.Queue()
+        return self.queues[tag]
+
+    async def _read(self):
+        while line := await self.process.stdout.readline():
+            text = line.decode().rstrip("\n")
+            tag = ""
+            if text.startswith("@"):
+                tag, _, text = text[1:].partition(" ")
+            await self._queue(tag).put(text)
+
+    def send(self, text, tag=""):
+        self.process.stdin.write(((f"@{tag} " if tag else "") + text + "\n").encode())
+
+    async def expect(self, prefix, tag=""):
+        """The next answer of game 'tag' that starts with 'prefix'; "info string" lines raise."""
+        queue = self._queue(tag)
+        while True:
+            text = await queue.get()
+            if text.startswith("info string"):
+                raise RuntimeError(text)
+            if text.startswith(prefix):
+                return text
+
+    async def request(self, text, prefix, tag=""):
+        """Seconds from sending 'text' to the answer starting with 'prefix'."""
+        started = time.perf_counter()
+        self.send(text, tag)
+        await self.process.stdin.drain()
+        await self.expect(prefix, tag)
+        return time.perf_counter() - started
+
+    async def close(self):
+        self.send("quit")
+        await self.process.stdin.drain()
+        self.process.stdin.close()
+        await self.process.wait()
+        self.reader.cancel()
+
+
+def report(label, seconds):
+    ms = sorted(s * 1000 for s in seconds)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label}: n={len(ms)} min {ms[0]:.2f} median {statistics.median(ms):.2f} "
+          f"p95 {p95:.2f} max {ms[-1]:.2f} ms")
+
+
+async def run(args):
+    started = time.perf_counter()
+    client = await EngineClient.start(args.threads)
+    try:
+        await client.request("isready", "readyok")
+        report("start-up", [time.perf_counter() - started])
+
+        report("isready", [await client.request("isready", "readyok") for _ in range(args.requests)])
+
+        async def game(tag):
+            client.send(f"position {args.position}", tag)
+            return await client.request(f"go depth {args.depth}", "bestmove", tag)
+
+        searches = []
+        for _ in range(args.rounds):
+            searches += await asyncio.gather(*(game(f"g{i}") for i in range(args.games)))
+        report(f"go depth {args.depth}, {args.games} games at once", searches)
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="isready round trips")
+    parser.add_argument("--games", type=int, default=4, help="games searching at the same time")
+    parser.add_argument("--rounds", type=int, default=5, help="searches per game")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=4, help="the server's --threads")
+    parser.add_argument("--position", default="startpos", help="position command arguments")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+# Python 3.11+
+"""
+Line protocol for driving the engine from another process, after UCI.
+
+    python engine_server.py [--threads 4] [--port N]
+
+Commands come one per line on stdin (or on every connection to --port),
+answers go to stdout:
+
+    uci                       id name ..., then uciok
+    isready                   readyok
+    newgame                   forgets the game's table and ordering tables
+    position startpos | sample <name> | fen <rows> <side> <ep>  [moves <move> ...]
+    go [movetime <ms>] [depth <n>] [infinite]
+                              info depth .. score cp .. | score mate <plies> nodes .. time .. pv ..
+                              then bestmove <move>, or bestmove none
+    stop                      ends the game's search; its bestmove follows
+    stats                     stats <the last search's SearchStats as JSON>
+    quit
+
+Positions are in extension/notation.py's notation, moves are "x,y-x,y";
+startpos is sample0. A line starting "@<id> " goes to game <id> and its
+answers carry the same prefix, so one process can play several games at
+once: every game keeps its own position and Session, while the move
+tables, Zobrist keys and endgame tables are shared. go returns at once;
+the searches run on a pool of --threads threads and each answers when it
+is done. Errors are reported as "info string ...".
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import agent
+from extension.notation import parse_position, board_text, parse_move, move_text
+from extension.session import Session
+from sample_boards import POSITIONS, make_custom_board
+
+ENGINE_NAME = "5x5 chessmaker engine"
+
+# seconds a "go infinite" search may run before it stops on its own
+INFINITE_SECONDS = 24 * 3600
+
+# searches running at the same time, over all games
+DEFAULT_THREADS = 4
+
+# samples.py positions in notation, for "position sample <name>"
+SAMPLES = {name: board_text(make_custom_board(squares)[0]) for name, squares in POSITIONS.items()}
+
+
+class Game:
+    """One game's state: its position, Session, last search statistics and running search."""
+
+    def __init__(self):
+        self.position = None
+        self.session = Session(agent.TT_SIZE_MB)
+        self.stats = None
+        self.search = None  # asyncio.Task of the running go
+        self.stop = threading.Event()
+
+    def searching(self):
+        return self.search is not None and not self.search.done()
+
+    async def stop_search(self):
+        if self.searching():
+            self.stop.set()
+            await self.search
+
+
+def score_text(stats):
+    """
+    The score of an info line: "cp <score>", or "mate <plies>" for a mate or
+    endgame-table win (negative when the side to move loses), counted in
+    plies from the root. None when no iteration finished and the score is
+    only the search's -INFINITY sentinel.
+    """
+    score = stats.score
+    if score is None or abs(score) >= agent.INFINITY:
+        return None
+    if abs(score) < agent.MATE_BOUND:
+        return f"cp {score}"
+    if stats.mate_plies is not None:
+        plies = stats.mate_plies
+    else:
+        # WIN_SCORE plus the depth still left where the game ended
+        plies = max(stats.depth + agent.WIN_SCORE - abs(score), 1)
+    return f"mate {plies if score > 0 else -plies}"
+
+
+def info_line(stats):
+    parts = [f"info depth {stats.depth}"]
+    score = score_text(stats)
+    if score is not None:
+        parts.append(f"score {score}")
+    parts.append(f"nodes {stats.nodes + stats.helper_nodes} time {round(stats.seconds * 1000)}")
+    if stats.pv:
+        parts.append("pv " + " ".join(stats.pv))
+    return " ".join(parts)
+
+
+def go_var(args, game):
+    """The agent 'var' for a go command's arguments."""
+    var = {"session": game.session, "stop": game.stop, "ponder": False}
+    words = iter(args)
+    for word in words:
+        if word == "movetime":
+            var["time_limit"] = _number(word, next(words, None)) / 1000
+        elif word == "depth":
+            var["depth"] = _number(word, next(words, None))
+            var.setdefault("time_limit", INFINITE_SECONDS)
+        elif word == "infinite":
+            var["time_limit"] = INFINITE_SECONDS
+        else:
+            raise ValueError(f"unknown go argument {word!r}")
+    return var
+
+
+def _number(name, text):
+    if text is None or not text.isdigit():
+        raise ValueError(f"{name} needs a number")
+    return int(text)
+
+
+class EngineServer:
+    """
+    Runs the commands of one stream. 'write' sends one answer line;
+    'executor' runs the searches, and may be shared between servers.
+    """
+
+    def __init__(self, write, executor):
+        self.write = write
+        self.executor = executor
+        self.games = {}
+
+    def send(self, tag, text):
+        self.write(f"@{tag} {text}" if tag else text)
+
+    def game(self, tag):
+        if tag not in self.games:
+            self.games[tag] = Game()
+        return self.games[tag]
+
+    async def handle(self, line):
+        """Runs one command line. Returns False once the stream should close."""
+        line = line.strip()
+        tag = ""
+        if line.startswith("@"):
+            tag, _, line = line[1:].partition(" ")
+        words = line.split()
+        if not words:
+            return True
+        command, args = words[0], words[1:]
+        if command == "quit":
+            return False
+        handler = getattr(self, "cmd_" + command, None)
+        if handler is None:
+            self.send(tag, f"info string unknown command {command!r}")
+            return True
+        try:
+            await handler(tag, args)
+        except ValueError as error:
+            self.send(tag, f"info string {command}: {error}")
+        return True
+
+    async def close(self):
+        """Stops every search and frees the games' tables."""
+        for game in self.games.values():
+            await game.stop_search()
+            game.session.close()
+        self.games = {}
+
+    async def cmd_uci(self, tag, args):
+        self.send(tag, f"id name {ENGINE_NAME}")
+        self.send(tag, "uciok")
+
+    async def cmd_isready(self, tag, args):
+        self.send(tag, "readyok")
+
+    async def cmd_newgame(self, tag, args):
+        game = self.game(tag)
+        await game.stop_search()
+        game.session.close()
+        game.session.new_game()
+        game.position = None
+        game.stats = None
+
+    async def cmd_position(self, tag, args):
+        if "moves" in args:
+            split = args.index("moves")
+            args, moves = args[:split], args[split + 1:]
+        else:
+            moves = []
+        if args == ["startpos"]:
+            text = SAMPLES["sample0"]
+        elif len(args) == 2 and args[0] == "sample":
+            if args[1] not in SAMPLES:
+                raise ValueError(f"no sample {args[1]!r}")
+            text = SAMPLES[args[1]]
+        elif args and args[0] == "fen":
+            text = " ".join(args[1:])
+        else:
+            raise ValueError("expected startpos, sample <name> or fen <position>")
+        position = parse_position(text)
+        for move in moves:
+            position.make(parse_move(position, move))
+        self.game(tag).position = position
+
+    async def cmd_go(self, tag, args):
+        game = self.game(tag)
+        if game.position is None:
+            raise ValueError("no position")
+        if game.searching():
+            raise ValueError("already searching")
+        var = go_var(args, game)
+        game.stop.clear()
+        # the search gets its own copy, so a position command may come in while it runs
+        game.search = asyncio.create_task(self._search(tag, game, game.position.copy(), var))
+
+    async def _search(self, tag, game, position, var):
+        loop = asyncio.get_running_loop()
+        try:
+            move, stats = await loop.run_in_executor(self.executor, agent.search_fast_board, position, var)
+        except Exception as error:
+            self.send(tag, f"info string search failed: {error!r}")
+            self.send(tag, "bestmove none")
+            return
+        game.stats = stats
+        self.send(tag, info_line(stats))
+        self.send(tag, f"bestmove {move_text(move) if move is not None else 'none'}")
+
+    async def cmd_stop(self, tag, args):
+        await self.game(tag).stop_search()
+
+    async def cmd_stats(self, tag, args):
+        stats = self.game(tag).stats
+        self.send(tag, "stats " + (json.dumps(stats.to_dict()) if stats is not None else "none"))
+
+
+async def serve_stdio(executor):
+    """Serves stdin/stdout until quit or end of input."""
+    loop = asyncio.get_running_loop()
+
+    def write(text):
+        sys.stdout.write(text + "\n")
+        sys.stdout.flush()
+
+    server = EngineServer(write, executor)
+    while True:
+        # a thread reads, so stdin can be a pipe, a terminal or a file
+        line = await loop.run_in_executor(None, sys.stdin.readline)
+        if not line or not await server.handle(line):
+            break
+    await server.close()
+
+
+async def serve_tcp(port, executor):
+    """Serves every connection to 127.0.0.1:'port' as its own stream, until interrupted."""
+
+    async def connection(reader, writer):
+        server = EngineServer(lambda text: writer.write(text.encode() + b"\n"), executor)
+        try:
+            while line := await reader.readline():
+                if not await server.handle(line.decode()):
+                    break
+                await writer.drain()
+        finally:
+            await server.close()
+            writer.close()
+
+    listener = await asyncio.start_server(connection, "127.0.0.1", port)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="searches running at once")
+    parser.add_argument("--port", type=int, help="serve TCP connections on 127.0.0.1 instead of stdin/stdout")
+    args = parser.parse_args()
+
+    with ThreadPoolExecutor(max(1, args.threads)) as executor:
+        if args.port:
+            asyncio.run(serve_tcp(args.port, executor))
+        else:
+            asyncio.run(serve_stdio(executor))
+
+
+if __name__ == "__main__":
+    main()
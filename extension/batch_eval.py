@@ -0,0 +1,108 @@
+"""
+Batched leaf evaluation: many positions scored in one set of array operations.
+
+Positions are rows of a uint8 (N, 25) array of FastBoard piece codes, square
+y * 5 + x in column y * 5 + x. A row scores evaluation.full_score(), plus
+evaluation.mobility() when evaluation.MOBILITY is set, from white's point of
+view, and the two must agree exactly with agent.evaluate(): the search mixes
+these scores with scalar ones. Without numpy, evaluate_batch() falls back to
+the scalar functions row by row.
+
+Mobility only looks at the squares holding a Knight, Bishop, Right or
+Queen. Every target is read as a colour (0 empty, 1 white, 2 black); a ray
+of four colours plus the mover's colour is a base-3 number that indexes a
+table of move counts, so a ray costs one lookup instead of a walk.
+"""
+from extension import evaluation
+from extension.evaluation import SQUARE_VALUES, MOBILITY_WEIGHTS, full_score, mobility
+from extension.movegen import KNIGHT_TARGETS, STRAIGHT_RAY_SQUARES, DIAGONAL_RAY_SQUARES
+from extension.piece_codes import SIZE, SQUARES, CODES, TYPE_MASK, BLACK_BIT, KNIGHT, BISHOP, RIGHT, QUEEN
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+RAY_LENGTH = SIZE - 1
+
+
+def encode(boards):
+    """FastBoard piece lists (or bytes) -> uint8 (N, 25) array; a list of lists without numpy."""
+    if np is None:
+        return [list(board) for board in boards]
+    data = b"".join(bytes(board) for board in boards)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, SQUARES)
+
+
+def _offsets(sq, squares, length):
+    # target - sq, padded with 0: the mover's own square never counts as a move
+    return [target - sq for target in squares] + [0] * (length - len(squares))
+
+
+def _weight(code, types):
+    piece_type = code & TYPE_MASK
+    if piece_type not in types:
+        return 0
+    return -MOBILITY_WEIGHTS[piece_type] if code & BLACK_BIT else MOBILITY_WEIGHTS[piece_type]
+
+
+def _ray_count(index):
+    # index: base-3 digits of the ray's colours, nearest first, then the mover's colour
+    own = index // 3 ** RAY_LENGTH
+    count = 0
+    for step in range(RAY_LENGTH):
+        colour = index // 3 ** step % 3
+        if colour != own:
+            count += 1
+        if colour:
+            break
+    return count
+
+
+if np is not None:
+    _SQUARE_VALUES = np.array(SQUARE_VALUES, dtype=np.int64)  # [code, square]
+    _COLUMNS = np.arange(SQUARES)
+    _COLOUR = np.array([0 if not code else 2 if code & BLACK_BIT else 1 for code in range(CODES)], dtype=np.intp)
+
+    # [square, jump] and [square, ray, step] target offsets; rays are 4 straight then 4 diagonal
+    _JUMPS = np.array([_offsets(sq, KNIGHT_TARGETS[sq], 8) for sq in range(SQUARES)], dtype=np.intp)
+    _RAYS = np.array([[_offsets(sq, ray, RAY_LENGTH) for ray in STRAIGHT_RAY_SQUARES[sq] + DIAGONAL_RAY_SQUARES[sq]]
+                      for sq in range(SQUARES)], dtype=np.intp)
+
+    # signed weights per move, +white -black: [code] for jumps, [code, ray] for rays
+    _JUMP_WEIGHTS = np.array([_weight(code, (KNIGHT, RIGHT)) for code in range(CODES)], dtype=np.int64)
+    _RAY_WEIGHTS = np.array([[_weight(code, (RIGHT, QUEEN))] * 4 + [_weight(code, (BISHOP, QUEEN))] * 4
+                             for code in range(CODES)], dtype=np.int64)
+    _JUMPERS = _JUMP_WEIGHTS != 0
+    _SLIDERS = _RAY_WEIGHTS.any(axis=1)
+
+    _DIGITS = 3 ** np.arange(RAY_LENGTH, dtype=np.intp)
+    _OWN_DIGIT = 3 ** RAY_LENGTH
+    _RAY_COUNTS = np.array([_ray_count(index) for index in range(3 ** (RAY_LENGTH + 1))], dtype=np.int64)
+
+
+def evaluate_batch(rows):
+    """Scores of a uint8 (N, 25) array (or a list of piece lists without numpy), white's point of view."""
+    if np is None:
+        if evaluation.MOBILITY:
+            return [full_score(row) + mobility(row) for row in rows]
+        return [full_score(row) for row in rows]
+
+    rows = np.asarray(rows, dtype=np.uint8)
+    scores = _SQUARE_VALUES[rows, _COLUMNS].sum(axis=1)
+    if not evaluation.MOBILITY:
+        return scores.tolist()
+    codes = rows.ravel()
+    colours = _COLOUR[codes]
+
+    row, sq = np.nonzero(_JUMPERS[rows])
+    cell = row * SQUARES + sq
+    moves = (colours.take(_JUMPS[sq] + cell[:, None]) != colours[cell][:, None]).sum(axis=1)
+    scores += np.bincount(row, _JUMP_WEIGHTS[codes[cell]] * moves, len(rows)).astype(np.int64)
+
+    row, sq = np.nonzero(_SLIDERS[rows])
+    cell = row * SQUARES + sq
+    index = colours.take(_RAYS[sq] + cell[:, None, None]) @ _DIGITS + (colours[cell] * _OWN_DIGIT)[:, None]
+    moves = (_RAY_WEIGHTS[codes[cell]] * _RAY_COUNTS[index]).sum(axis=1)
+    scores += np.bincount(row, moves, len(rows)).astype(np.int64)
+    return scores.tolist()
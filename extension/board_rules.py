@@ -1,43 +1,89 @@
 from chessmaker.chess.pieces import King
-from chessmaker.chess.results import no_kings, checkmate
-
-def _position_key(board):
-    pieces = []
-    for p in board.get_pieces():
-        pieces.append((p.name.lower(), getattr(p.player, "name", str(p.player)), p.position.x, p.position.y))
-    pieces.sort()
-    side_to_move = getattr(board.current_player, "name", str(board.current_player))
-    return (tuple(pieces), side_to_move)
-
-def _update_repetition_count(board):
-    if not hasattr(board, "_rep_hist") or board._rep_hist is None:
-        board._rep_hist = {}
-    key = _position_key(board)
-    if key in board._rep_hist:
-        board._rep_hist[key] = board._rep_hist[key] + 1
-    else:
-        board._rep_hist[key] = 1    
-        
-    return board._rep_hist[key]
-
-def get_result(board):
-    rep_count = _update_repetition_count(board)
-    if rep_count >= 5:
-        return "Draw - fivefold repetition"
-    for rf in [no_kings, checkmate, cannot_move, only_2kings]:
-        res = rf(board)
-        if res:
-            return res
-    return None
-
-def cannot_move(board):
-    current_player = board.current_player
-    player_pieces = list(board.get_player_pieces(current_player))
-    for piece in player_pieces:
-        if piece.get_move_options():
-            return None
+from chessmaker.chess.results import no_kings
+from extension.board_utils import list_legal_moves_for
+from extension.fast_board import FastBoard, PAWN, TYPE_MASK, colour_of
+
+class RepetitionHistory:
+    """
+    Zobrist hashes of the positions of a game, pushed after every move.
+
+    Only the positions since the last capture or pawn move can repeat, so
+    count() scans back at most that far instead of keeping a dict of every
+    position ever seen. Hashes match FastBoard.hash, so the same window can
+    seed a search (see FastBoard.from_board).
+    """
+
+    def __init__(self):
+        self.hashes = []
+        self.clocks = []  # plies since the last irreversible move, per entry
+        self._material = []  # (piece count, pawn squares) per entry
 
-    return f"Stalemate (no more possible moves) - {current_player.name} loses" 
+    def push(self, board):
+        position = FastBoard.from_board(board)
+        pieces = 0
+        pawns = 0
+        for sq, code in enumerate(position.board):
+            if code:
+                pieces += 1
+                if code & TYPE_MASK == PAWN:
+                    pawns |= 1 << (sq + 32 * colour_of(code))
+        material = (pieces, pawns)
+        if self._material and self._material[-1] == material:
+            clock = self.clocks[-1] + 1
+        else:
+            clock = 0
+        self.hashes.append(position.hash)
+        self.clocks.append(clock)
+        self._material.append(material)
+
+    def pop(self):
+        self.hashes.pop()
+        self.clocks.pop()
+        self._material.pop()
+
+    def window(self):
+        """Hashes since the last irreversible move, current position last."""
+        if not self.hashes:
+            return []
+        return self.hashes[len(self.hashes) - 1 - self.clocks[-1]:]
+
+    def count(self):
+        """Occurrences of the latest position within the window."""
+        if not self.hashes:
+            return 0
+        h = self.hashes[-1]
+        count = 1
+        i = len(self.hashes) - 3
+        stop = len(self.hashes) - 1 - self.clocks[-1]
+        while i >= stop:
+            if self.hashes[i] == h:
+                count += 1
+            i -= 2
+        return count
+
+def get_result(board, history=None, legal_moves=None):
+    """
+    'history' is the game's RepetitionHistory with 'board' as its latest entry;
+    without it the fivefold repetition rule is not checked.
+    'legal_moves' is list_legal_moves_for(board, board.current_player) if the
+    caller already has it; otherwise it is generated once here and used for
+    both the checkmate and the stalemate test.
+    """
+    if history is not None and history.count() >= 5:
+        return "Draw - fivefold repetition"
+    res = no_kings(board)
+    if res:
+        return res
+    if legal_moves is None:
+        legal_moves = list_legal_moves_for(board, board.current_player)
+    if not legal_moves:
+        # same results, in the same order, as chessmaker's checkmate and cannot_move
+        current_player = board.current_player
+        kings = [piece for piece in board.get_player_pieces(current_player) if isinstance(piece, King)]
+        if all(king.is_attacked() for king in kings):
+            return f"Checkmate - {current_player.name} loses"
+        return f"Stalemate (no more possible moves) - {current_player.name} loses"
+    return only_2kings(board)
 
 def only_2kings(board):
     all_pieces = []
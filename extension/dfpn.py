@@ -0,0 +1,209 @@
+"""
+Depth-first proof-number search (df-pn): proves that the side to move at
+the root, the attacker, wins by force.
+
+Wins and losses are get_terminal_score's: a side to move that is
+checkmated, stalemated or has lost its king has lost. Fivefold repetition
+and two bare kings are draws, which count against the attacker, as does a
+position repeated on the current line and one MAX_PLIES deep.
+
+Every node keeps two numbers from its side to move's point of view, in the
+usual phi/delta form: phi is the proof number of a win, delta of a loss.
+phi is the smallest delta of the children and delta the sum of their phis,
+so one rule serves both players. A node with phi 0 is won in 'distance'
+plies at most, always following children whose distance is smaller, so a
+proven line makes progress however often it is looked up again.
+"""
+from extension.fast_board import FIVEFOLD, ONLY_2_KINGS
+from extension.search_control import SearchAborted
+
+INFINITE = 1 << 40
+
+# the 1 + epsilon trick: a child's threshold overshoots the second best sibling, so the
+# search stays in one subtree a little longer instead of seesawing between two
+EPSILON = 0.25
+
+# lines deeper than this are not followed; they count against the attacker
+MAX_PLIES = 64
+
+# (phi, delta, distance) for a finished game, from the side to move's point of view
+LOST = (INFINITE, 0, 0)
+
+
+class ProofTable:
+    """
+    (phi, delta, distance) per position and attacker, at most 'max_entries'.
+    When full, unsolved entries are dropped first; solved ones (phi or delta
+    0) only go if nothing else can, as they are worth the most work.
+    """
+
+    def __init__(self, max_entries=200000):
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def put(self, key, entry):
+        entries = self.entries
+        if len(entries) >= self.max_entries and key not in entries:
+            self.entries = {k: e for k, e in entries.items() if not e[0] or not e[1]}
+            if len(self.entries) >= self.max_entries // 2:
+                self.entries = {}
+            entries = self.entries
+        entries[key] = entry
+
+
+class MateSolver:
+    """
+    df-pn from one root position. solve() returns the proven line (moves,
+    the attacker's first) or None if the attacker cannot force a win;
+    ctx.control aborts it with SearchAborted like any other search.
+    """
+
+    def __init__(self, table, control):
+        self.table = table
+        self.control = control
+        self.attacker = 0
+        self.root_ply = 0
+
+    def _key(self, position):
+        # draws count against the attacker, so entries only hold for one of them
+        return position.key() << 1 | self.attacker
+
+    def _draw(self, position):
+        # a draw lost by the attacker: phi/delta from the side to move's point of view
+        return LOST if position.side == self.attacker else (0, INFINITE, 0)
+
+    def _terminal(self, position):
+        """(phi, delta, distance) of a position decided without search, or None."""
+        result = position.quick_result()
+        if result is not None:
+            return self._draw(position) if result in (FIVEFOLD, ONLY_2_KINGS) else LOST
+        if position.repetition_count() > 1 or position.ply - self.root_ply >= MAX_PLIES:
+            return self._draw(position)
+        return None
+
+    def solve(self, position):
+        self.attacker = position.side
+        self.root_ply = position.ply
+        self._mid(position, INFINITE, INFINITE)
+        entry = self.table.get(self._key(position))
+        if entry is None or entry[0]:
+            return None
+        return self.proven_line(position)
+
+    def _mid(self, position, phi_limit, delta_limit):
+        """Expands 'position' until its phi reaches phi_limit or its delta delta_limit."""
+        self.control.tick()
+        terminal = self._terminal(position)
+        if terminal is not None:
+            # path dependent (repetitions, the ply limit), so not stored
+            return terminal
+        moves = position.legal_moves()
+        if not moves:
+            self.table.put(self._key(position), LOST)
+            return LOST
+
+        table = self.table
+        children = []
+        for move in moves:
+            position.make(move)
+            children.append((move, self._key(position), self._terminal(position)))
+            position.unmake()
+
+        while True:
+            phi, delta, distance, best, second_delta = self._gather(children)
+            if phi >= phi_limit or delta >= delta_limit:
+                break
+            move, key, terminal = children[best]
+            child_phi = (table.get(key) or (1, 1, 0))[0]
+            # the child stays best while its delta is below the second best's; our delta
+            # is the sum of the children's phis, so the child's phi may use up the rest
+            child_phi_limit = delta_limit - delta + child_phi
+            child_delta_limit = min(phi_limit, int(second_delta * (1 + EPSILON)) + 1)
+            position.make(move)
+            self._mid(position, child_phi_limit, child_delta_limit)
+            position.unmake()
+
+        entry = (phi, delta, distance)
+        table.put(self._key(position), entry)
+        return entry
+
+    def _gather(self, children):
+        """
+        phi, delta and distance of a node from its children, the index of
+        the child to expand (smallest delta) and the second smallest delta.
+        """
+        table = self.table
+        phi = INFINITE
+        delta = 0
+        second = INFINITE
+        best = 0
+        win_distance = INFINITE
+        loss_distance = 0
+        for index, (_, key, terminal) in enumerate(children):
+            child_phi, child_delta, child_distance = terminal or table.get(key) or (1, 1, 0)
+            if child_delta < phi:
+                second = phi
+                phi = child_delta
+                best = index
+            elif child_delta < second:
+                second = child_delta
+            delta = min(delta + child_phi, INFINITE)
+            if child_delta == 0:
+                win_distance = min(win_distance, child_distance + 1)
+            loss_distance = max(loss_distance, child_distance + 1)
+        if phi == 0:
+            distance = win_distance
+        elif delta == 0:
+            distance = loss_distance
+        else:
+            distance = 0
+        return phi, delta, distance, best, second
+
+    def proven_line(self, position, length=MAX_PLIES):
+        """
+        The line the table proves from a won 'position': the attacker's
+        quickest winning child, the defender's longest resistance.
+        """
+        line = []
+        while len(line) < length:
+            entry = self.table.get(self._key(position))
+            if entry is None or (entry[0] and entry[1]):
+                break
+            best_move, best_key = None, None
+            for move in position.legal_moves():
+                position.make(move)
+                child = self._terminal(position) or self.table.get(self._key(position))
+                position.unmake()
+                if child is None:
+                    continue
+                if entry[0] == 0:
+                    # won: a lost child, fewest plies
+                    key = -child[2] if child[1] == 0 else None
+                else:
+                    # lost: a won child, most plies
+                    key = child[2] if child[0] == 0 else None
+                if key is not None and (best_key is None or key > best_key):
+                    best_move, best_key = move, key
+            if best_move is None:
+                break
+            position.make(best_move)
+            line.append(best_move)
+        for _ in line:
+            position.unmake()
+        return line
+
+
+def solve_mate(position, table, control):
+    """
+    The attacker's proven winning line from 'position' (side to move attacks),
+    None if there is none, or None as well when 'control' runs out first.
+    """
+    root_ply = position.ply
+    try:
+        return MateSolver(table, control).solve(position)
+    except SearchAborted:
+        position.unwind(root_ply)
+        return None
@@ -0,0 +1,157 @@
+"""
+Material and piece-square evaluation kept as a running total by FastBoard,
+plus an optional mobility term computed at the leaf (MOBILITY).
+
+SQUARE_VALUES[code][sq] is the full contribution of a piece code on a square
+(material plus table bonus), positive for white and negative for black, so
+make/unmake only add and subtract a few table entries. mobility() is the
+square-by-square reference; extension/batch_eval.py scores many positions
+at once with the same numbers.
+"""
+from extension.piece_codes import SIZE, SQUARES, CODES, PIECE_NAMES, TYPE_MASK, BLACK_BIT, \
+    PAWN, KNIGHT, BISHOP, RIGHT, QUEEN, KING
+from extension.movegen import KNIGHT_TARGETS, STRAIGHT_RAY_SQUARES, DIAGONAL_RAY_SQUARES
+
+PIECE_VALUES = {
+    "King": 0,
+    "Queen": 900,
+    "Right": 750,
+    "Bishop": 300,
+    "Knight": 300,
+    "Pawn": 100
+}
+
+# Set to True to check every incremental score against a full recompute.
+DEBUG = False
+
+# Piece-square tables from white's side of the board: row 0 is where white
+# pawns promote, row 4 is white's back rank. Black uses them mirrored.
+PIECE_SQUARE_TABLES = {
+    PAWN: [
+        0, 0, 0, 0, 0,
+        40, 50, 50, 50, 40,
+        10, 20, 25, 20, 10,
+        0, 0, 0, 0, 0,
+        0, 0, 0, 0, 0,
+    ],
+    # a knight has 2 moves from a corner and 8 only from the centre
+    KNIGHT: [
+        -20, -10, -5, -10, -20,
+        -10, 0, 5, 0, -10,
+        -5, 5, 10, 5, -5,
+        -10, 0, 5, 0, -10,
+        -20, -10, -5, -10, -20,
+    ],
+    BISHOP: [
+        -10, -5, -5, -5, -10,
+        -5, 5, 0, 5, -5,
+        -5, 0, 10, 0, -5,
+        -5, 5, 0, 5, -5,
+        -10, -5, -5, -5, -10,
+    ],
+    # the rook half of Right moves the same from every square, so only the knight half is rewarded
+    RIGHT: [
+        -10, -5, 0, -5, -10,
+        -5, 0, 5, 0, -5,
+        0, 5, 10, 5, 0,
+        -5, 0, 5, 0, -5,
+        -10, -5, 0, -5, -10,
+    ],
+    QUEEN: [
+        -5, 0, 0, 0, -5,
+        0, 5, 5, 5, 0,
+        0, 5, 5, 5, 0,
+        0, 5, 5, 5, 0,
+        -5, 0, 0, 0, -5,
+    ],
+    KING: [
+        -20, -20, -20, -20, -20,
+        -15, -15, -15, -15, -15,
+        -10, -10, -10, -10, -10,
+        -5, -5, -5, -5, -5,
+        0, 5, 5, 5, 0,
+    ],
+}
+
+
+# mobility() scans the whole board, which undoes the incremental score at every leaf, so it is off
+# by default; evaluate() and batch_eval.evaluate_batch() both add it when this is set. It pays for
+# itself in batched scoring (agent.BATCH_FRONTIER) rather than at scalar leaves
+MOBILITY = False
+
+# points per square a piece could move to, empty or enemy-occupied, checks ignored; pawns and kings get none
+MOBILITY_WEIGHTS = {
+    KNIGHT: 4,
+    BISHOP: 3,
+    RIGHT: 2,
+    QUEEN: 1,
+}
+
+
+def _mirror(sq):
+    return (SIZE - 1 - sq // SIZE) * SIZE + sq % SIZE
+
+
+def _square_values():
+    values = [[0] * SQUARES for _ in range(CODES)]
+    for code in range(1, CODES):
+        piece_type = code & TYPE_MASK
+        if piece_type not in PIECE_NAMES:
+            continue
+        material = PIECE_VALUES[PIECE_NAMES[piece_type]]
+        table = PIECE_SQUARE_TABLES[piece_type]
+        for sq in range(SQUARES):
+            if code & BLACK_BIT:
+                values[code][sq] = -(material + table[_mirror(sq)])
+            else:
+                values[code][sq] = material + table[sq]
+    return values
+
+
+SQUARE_VALUES = _square_values()
+
+
+def full_score(board):
+    """Score of a FastBoard piece list from white's point of view, computed from scratch."""
+    score = 0
+    for sq, code in enumerate(board):
+        if code:
+            score += SQUARE_VALUES[code][sq]
+    return score
+
+
+def mobility(board):
+    """Mobility term of a FastBoard piece list from white's point of view."""
+    score = 0
+    for sq, code in enumerate(board):
+        piece_type = code & TYPE_MASK
+        weight = MOBILITY_WEIGHTS.get(piece_type)
+        if not weight:
+            continue
+        own = code & BLACK_BIT
+        count = 0
+        if piece_type == KNIGHT or piece_type == RIGHT:
+            for target in KNIGHT_TARGETS[sq]:
+                if not board[target] or board[target] & BLACK_BIT != own:
+                    count += 1
+        rays = []
+        if piece_type == RIGHT or piece_type == QUEEN:
+            rays += STRAIGHT_RAY_SQUARES[sq]
+        if piece_type == BISHOP or piece_type == QUEEN:
+            rays += DIAGONAL_RAY_SQUARES[sq]
+        for ray in rays:
+            for target in ray:
+                if board[target]:
+                    if board[target] & BLACK_BIT != own:
+                        count += 1
+                    break
+                count += 1
+        score += -weight * count if own else weight * count
+    return score
+
+
+def check_score(position):
+    """Raises AssertionError if the incremental score has drifted from a full recompute."""
+    expected = full_score(position.board)
+    if position.score != expected:
+        raise AssertionError(f"incremental evaluation drifted: {position.score} != {expected}")
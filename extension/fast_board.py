@@ -0,0 +1,435 @@
+from itertools import cycle
+
+from chessmaker.chess.base import Board, Square
+from chessmaker.chess.base import Position as BoardPosition
+from chessmaker.chess.pieces import King, Queen, Bishop, Knight, Pawn
+from extension.piece_right import Right
+from extension.zobrist import PIECE_KEYS, SIDE_KEY, EP_KEYS, hash_board
+from extension.piece_codes import SIZE, SQUARES, WHITE, BLACK, EMPTY, PAWN, KNIGHT, BISHOP, RIGHT, \
+    QUEEN, KING, TYPE_MASK, BLACK_BIT, UNMOVED, PIECE_NAMES, PIECE_TYPES, PAWN_DIRECTION, \
+    PROMOTION_ROW, colour_of
+from extension.movegen import add_piece_moves, is_attacked, occupancy, move_squares, FROM_SHIFT, SQUARE_MASK
+from extension.evaluation import SQUARE_VALUES, full_score
+
+# Results, in the order board_rules.get_result checks them.
+FIVEFOLD = "fivefold repetition"
+NO_KINGS = "no kings"
+CHECKMATE = "checkmate"
+STALEMATE = "stalemate"
+ONLY_2_KINGS = "only 2 kings"
+
+
+class FastBoard:
+    """
+    Array-backed 5x5 position with in-place make/unmake.
+
+    Mirrors the rules chessmaker applies to the pieces used in samples.py
+    (King, Queen, Right, Bishop, Knight and Pawn_Q, including the pawn double
+    step, en passant and promotion to Queen) so the search never has to clone
+    a chessmaker Board. Moves are ints (see extension/movegen.py); a pawn
+    reaching its last row always promotes to Queen.
+    """
+
+    __slots__ = ("board", "side", "kings", "ep", "occ", "players", "hash", "history", "clock",
+                 "score", "_undo")
+
+    def __init__(self, board, side, ep=-1, players=None):
+        self.board = board
+        self.side = side
+        self.ep = ep  # square a pawn just double stepped over, or -1
+        self.occ = occupancy(board)  # bit per occupied square, indexes the slider tables
+        self.score = full_score(board)  # material + piece-square, white minus black
+        self.players = players
+        self._undo = []
+        # Zobrist hash of pieces and side to move; the en passant square is left
+        # out so it compares positions the way board_rules' repetition check does.
+        self.hash = hash_board(board, side)
+        # hashes of every position reached so far (current one last) and the number
+        # of plies since the last capture or pawn move, which no repetition can cross
+        self.history = [self.hash]
+        self.clock = 0
+        self.kings = [-1, -1]
+        for sq, code in enumerate(board):
+            if code & TYPE_MASK == KING:
+                colour = colour_of(code)
+                if self.kings[colour] != -1:
+                    raise ValueError("FastBoard supports one king per side")
+                self.kings[colour] = sq
+
+    # ------------------------------------------------------------------
+    # chessmaker conversion
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_board(cls, board, history=None):
+        """
+        Builds a FastBoard from a chessmaker Board (players named white/black).
+        'history' is an optional board_rules.RepetitionHistory of the game so far.
+        """
+        players = [None, None]
+        for player in board.players:
+            players[_player_colour(player)] = player
+
+        side = _player_colour(board.current_player)
+        cells = [EMPTY] * SQUARES
+        ep = -1
+        for piece in board.get_pieces():
+            pos = piece.position
+            sq = pos.y * SIZE + pos.x
+            colour = _player_colour(piece.player)
+            piece_type = PIECE_TYPES.get(piece.name)
+            if piece_type is None:
+                raise ValueError(f"Unsupported piece: {piece.name}")
+            code = piece_type | (BLACK_BIT if colour else 0)
+
+            if piece_type == PAWN:
+                if piece._direction.value != PAWN_DIRECTION[colour] or "Queen" not in piece.promotions:
+                    raise ValueError("Only Pawn_Q pawns are supported")
+                if piece._moved_turns_ago == -1:
+                    code |= UNMOVED
+                last = piece._last_position
+                if (colour != side and 0 <= piece._moved_turns_ago <= 1 and last is not None
+                        and last.x == pos.x and abs(last.y - pos.y) == 2):
+                    ep = (last.y + pos.y) // 2 * SIZE + pos.x
+            cells[sq] = code
+
+        position = cls(cells, side, ep, players)
+        if history is not None:
+            window = history.window()
+            if window and window[-1] == position.hash:
+                position.history = window
+                position.clock = len(window) - 1
+        return position
+
+    def to_board(self, players=None):
+        """Builds an equivalent chessmaker Board, with the side to move first in the turn order."""
+        players = list(players or self.players)
+        rows = []
+        for y in range(SIZE):
+            row = []
+            for x in range(SIZE):
+                code = self.board[y * SIZE + x]
+                if code == EMPTY:
+                    row.append(Square())
+                    continue
+                player = players[colour_of(code)]
+                piece_type = code & TYPE_MASK
+                if piece_type == PAWN:
+                    colour = colour_of(code)
+                    direction = Pawn.Direction.UP if colour == WHITE else Pawn.Direction.DOWN
+                    sq = y * SIZE + x
+                    if code & UNMOVED:
+                        piece = Pawn(player, direction, promotions=[Queen])
+                    elif self.ep != -1 and sq == self.ep + SIZE * PAWN_DIRECTION[colour]:
+                        # the pawn that just double stepped keeps its en passant window open
+                        last = self.ep * 2 - sq
+                        piece = Pawn(player, direction, promotions=[Queen], moved_turns_ago=1,
+                                     last_position=BoardPosition(last % SIZE, last // SIZE))
+                    else:
+                        piece = Pawn(player, direction, promotions=[Queen], moved_turns_ago=2)
+                else:
+                    piece = _PIECE_CLASSES[piece_type](player)
+                row.append(Square(piece))
+            rows.append(row)
+
+        turn_order = players[self.side:] + players[:self.side]
+        return Board(squares=rows, players=players, turn_iterator=cycle(turn_order))
+
+    def to_piece_move(self, board, move):
+        """Maps a move back to the (piece, MoveOption) pair on a chessmaker Board."""
+        frm, to = move_squares(move)
+        piece = board[BoardPosition(frm % SIZE, frm // SIZE)].piece
+        if piece is None:
+            return None, None
+        dest = BoardPosition(to % SIZE, to // SIZE)
+        for move_opt in piece.get_move_options():
+            if move_opt.position == dest:
+                return piece, move_opt
+        return piece, None
+
+    # ------------------------------------------------------------------
+    # make / unmake
+    # ------------------------------------------------------------------
+
+    def make(self, move):
+        frm = move >> FROM_SHIFT & SQUARE_MASK
+        to = move & SQUARE_MASK
+        board = self.board
+        piece = board[frm]
+        captured = board[to]
+        cap_sq = to
+        piece_type = piece & TYPE_MASK
+        moved = piece
+
+        new_ep = -1
+        if piece_type == PAWN:
+            if to == self.ep and captured == EMPTY:
+                # en passant: the captured pawn sits behind the destination square
+                cap_sq = to - SIZE * PAWN_DIRECTION[self.side]
+                captured = board[cap_sq]
+                board[cap_sq] = EMPTY
+                self.occ ^= 1 << cap_sq
+            moved &= ~UNMOVED
+            if to // SIZE == PROMOTION_ROW[self.side]:
+                moved = QUEEN | (piece & BLACK_BIT)
+            elif abs(to - frm) == 2 * SIZE:
+                new_ep = (frm + to) // 2
+        elif piece_type == KING:
+            self.kings[self.side] = to
+
+        if captured & TYPE_MASK == KING:
+            self.kings[self.side ^ 1] = -1
+
+        self._undo.append((move, frm, to, piece, captured, cap_sq, self.ep, self.hash, self.clock, self.score))
+        board[frm] = EMPTY
+        board[to] = moved
+        self.occ = (self.occ & ~(1 << frm)) | (1 << to)
+        h = self.hash ^ PIECE_KEYS[piece][frm] ^ PIECE_KEYS[moved][to] ^ SIDE_KEY
+        if captured:
+            h ^= PIECE_KEYS[captured][cap_sq]
+        self.hash = h
+        self.history.append(h)
+        score = self.score - SQUARE_VALUES[piece][frm] + SQUARE_VALUES[moved][to]
+        if captured:
+            score -= SQUARE_VALUES[captured][cap_sq]
+        self.score = score
+        self.clock = 0 if captured or piece_type == PAWN else self.clock + 1
+        self.ep = new_ep
+        self.side ^= 1
+
+    def unmake(self):
+        _, frm, to, piece, captured, cap_sq, ep, self.hash, self.clock, self.score = self._undo.pop()
+        self.history.pop()
+        board = self.board
+        self.side ^= 1
+        self.ep = ep
+        board[frm] = piece
+        board[to] = EMPTY
+        board[cap_sq] = captured
+        self.occ = (self.occ & ~(1 << to)) | (1 << frm)
+        if captured:
+            self.occ |= 1 << cap_sq
+        if piece & TYPE_MASK == KING:
+            self.kings[self.side] = frm
+        if captured & TYPE_MASK == KING:
+            self.kings[self.side ^ 1] = cap_sq
+
+    def make_null(self):
+        """Passes the turn (for null-move pruning). Any en passant chance expires, as after a real move."""
+        # the clock restarts so no repetition is counted across the pass
+        self._undo.append((None, -1, -1, EMPTY, EMPTY, -1, self.ep, self.hash, self.clock, self.score))
+        self.hash ^= SIDE_KEY
+        self.history.append(self.hash)
+        self.clock = 0
+        self.ep = -1
+        self.side ^= 1
+
+    def unmake_null(self):
+        _, _, _, _, _, _, self.ep, self.hash, self.clock, self.score = self._undo.pop()
+        self.history.pop()
+        self.side ^= 1
+
+    def unwind(self, ply):
+        """Takes back moves and passes until 'ply' moves are left, e.g. after an aborted search."""
+        while len(self._undo) > ply:
+            if self._undo[-1][0] is None:
+                self.unmake_null()
+            else:
+                self.unmake()
+
+    def child_cells(self, move):
+        """The board after 'move' as bytes of piece codes, the same cells make() leaves, without making it."""
+        frm, to = move_squares(move)
+        cells = bytearray(self.board)
+        piece = cells[frm]
+        moved = piece
+        if piece & TYPE_MASK == PAWN:
+            if to == self.ep and cells[to] == EMPTY:
+                cells[to - SIZE * PAWN_DIRECTION[self.side]] = EMPTY
+            moved &= ~UNMOVED
+            if to // SIZE == PROMOTION_ROW[self.side]:
+                moved = QUEEN | (piece & BLACK_BIT)
+        cells[frm] = EMPTY
+        cells[to] = moved
+        return bytes(cells)
+
+    def copy(self):
+        """An independent FastBoard with the same position, history and undo stack."""
+        other = FastBoard.__new__(FastBoard)
+        for name in self.__slots__:
+            value = getattr(self, name)
+            setattr(other, name, list(value) if type(value) is list else value)
+        return other
+
+    @property
+    def ply(self):
+        """Number of moves made on this FastBoard that can still be unmade."""
+        return len(self._undo)
+
+    def last_move(self):
+        """The move that led to this position, or None at the root and after a null move."""
+        if not self._undo:
+            return None
+        return self._undo[-1][0]
+
+    def key(self):
+        """Transposition table key: the position hash plus any en passant square."""
+        if self.ep == -1:
+            return self.hash
+        return self.hash ^ EP_KEYS[self.ep]
+
+    def repetition_count(self):
+        """How many times the current position has occurred since the last irreversible move."""
+        history = self.history
+        h = self.hash
+        count = 1
+        # same side to move only every second ply
+        i = len(history) - 3
+        stop = len(history) - 1 - self.clock
+        while i >= stop:
+            if history[i] == h:
+                count += 1
+            i -= 2
+        return count
+
+    # ------------------------------------------------------------------
+    # move generation
+    # ------------------------------------------------------------------
+
+    def pseudo_moves(self):
+        """All moves for the side to move, ignoring whether they leave the king attacked."""
+        board = self.board
+        side = self.side
+        occ = self.occ
+        ep = self.ep
+        moves = []
+        for frm in range(SQUARES):
+            code = board[frm]
+            if code != EMPTY and colour_of(code) == side:
+                add_piece_moves(moves, board, occ, side, ep, frm, code)
+        return moves
+
+    def king_exposed(self):
+        """
+        Right after make(): True if the move left the mover's king attacked,
+        i.e. it was pseudo-legal only. The search makes pseudo_moves() and
+        tests them with this, instead of filtering with legal_moves() first.
+        """
+        king = self.kings[self.side ^ 1]
+        return king != -1 and is_attacked(self.board, self.occ, king, self.side)
+
+    def _leaves_king_safe(self, move):
+        self.make(move)
+        safe = not self.king_exposed()
+        self.unmake()
+        return safe
+
+    def legal_moves(self):
+        """Same move set as list_legal_moves_for: a side with a king may not leave it attacked."""
+        moves = self.pseudo_moves()
+        if self.kings[self.side] == -1:
+            return moves
+        return [move for move in moves if self._leaves_king_safe(move)]
+
+    def has_legal_move(self):
+        """Generates one piece at a time and stops at the first legal move."""
+        board = self.board
+        side = self.side
+        has_king = self.kings[side] != -1
+        moves = []
+        for frm in range(SQUARES):
+            code = board[frm]
+            if code == EMPTY or colour_of(code) != side:
+                continue
+            add_piece_moves(moves, board, self.occ, side, self.ep, frm, code)
+            for move in moves:
+                if not has_king or self._leaves_king_safe(move):
+                    return True
+            moves.clear()
+        return False
+
+    def is_attacked(self, sq, by_colour):
+        """True if any piece of 'by_colour' could capture on 'sq' (pins ignored, as in chessmaker)."""
+        return is_attacked(self.board, self.occ, sq, by_colour)
+
+    def in_check(self):
+        """
+        chessmaker's King.is_attacked() only counts enemy moves that are legal
+        for the enemy, so an attacker pinned to its own king does not give check.
+        """
+        side = self.side
+        enemy = side ^ 1
+        king_sq = self.kings[side]
+        if king_sq == -1 or not self.is_attacked(king_sq, enemy):
+            return False
+        if self.kings[enemy] == -1:
+            return True
+
+        self.side = enemy
+        try:
+            for move in self.pseudo_moves():
+                if move & SQUARE_MASK == king_sq and self._leaves_king_safe(move):
+                    return True
+        finally:
+            self.side = side
+        return False
+
+    # ------------------------------------------------------------------
+    # game result
+    # ------------------------------------------------------------------
+
+    def get_result(self, legal_moves=None):
+        """
+        Same checks, in the same order, as board_rules.get_result.
+        Pass the node's legal_moves() when they are already generated; otherwise
+        only as much generation as it takes to find one legal move is done.
+        """
+        if self.repetition_count() >= 5:
+            return FIVEFOLD
+        if self.kings[WHITE] == -1 or self.kings[BLACK] == -1:
+            return NO_KINGS
+        if not (legal_moves if legal_moves is not None else self.has_legal_move()):
+            return self.no_move_result()
+        if self._only_kings():
+            return ONLY_2_KINGS
+        return None
+
+    def quick_result(self):
+        """
+        The part of get_result() that needs no move generation. A search that
+        generates pseudo-legal moves calls this first and tells checkmate from
+        stalemate itself once no move turns out legal. Two bare kings can be
+        checked early: a lone king always has a legal move.
+        """
+        if self.repetition_count() >= 5:
+            return FIVEFOLD
+        if self.kings[WHITE] == -1 or self.kings[BLACK] == -1:
+            return NO_KINGS
+        if self._only_kings():
+            return ONLY_2_KINGS
+        return None
+
+    def no_move_result(self):
+        """get_result() of a position with both kings, no repetition and no legal move."""
+        return CHECKMATE if self.in_check() else STALEMATE
+
+    def _only_kings(self):
+        # called with both kings on the board, so two pieces means two kings
+        pieces = 0
+        for code in self.board:
+            if code != EMPTY:
+                pieces += 1
+                if pieces > 2:
+                    return False
+        return pieces == 2
+
+
+_PIECE_CLASSES = {KNIGHT: Knight, BISHOP: Bishop, RIGHT: Right, QUEEN: Queen, KING: King}
+
+
+def _player_colour(player):
+    if player.name == "white":
+        return WHITE
+    if player.name == "black":
+        return BLACK
+    raise ValueError(f"Unknown player: {player.name}")
@@ -0,0 +1,259 @@
+"""
+Monte Carlo Tree Search over FastBoard positions.
+
+Every simulation walks down the tree by UCT, adds one child for a move not
+tried yet and plays a random game (a rollout) from it. A node counts the
+results for the side that made the move into it, so every level picks the
+child best for the side to move there.
+
+Rollouts can run in batches on a process pool: a round selects up to
+'batch' leaves, with a virtual loss on every path so the selections spread
+out, plays their rollouts in parallel and only then backs the results up.
+"""
+import math
+import random
+
+from extension.fast_board import FastBoard, FIVEFOLD, ONLY_2_KINGS
+
+# UCT exploration constant
+EXPLORATION = 1.4
+
+# plies after which a rollout stops and counts as a draw
+ROLLOUT_PLIES = 100
+
+# every other result loses for the side to move: checkmate, stalemate and a missing king
+DRAW_RESULTS = (FIVEFOLD, ONLY_2_KINGS)
+
+WIN, DRAW, LOSS = 1.0, 0.5, 0.0
+
+
+def make_random_move(position, rng=random):
+    """
+    Makes a move drawn uniformly from the legal moves and returns it, or
+    returns None, making nothing, when there is none. Pseudo-legal moves are
+    drawn until one leaves the king safe: uniform over the pseudo-legal moves
+    given legality is uniform over the legal ones, and one generation pass
+    with usually a single make() does it.
+    """
+    moves = position.pseudo_moves()
+    while moves:
+        i = rng.randrange(len(moves))
+        move = moves[i]
+        position.make(move)
+        if not position.king_exposed():
+            return move
+        position.unmake()
+        moves[i] = moves[-1]
+        moves.pop()
+    return None
+
+
+def random_legal_move(position, rng=random):
+    """A move drawn uniformly from the legal moves, or None. The position is left as it was."""
+    move = make_random_move(position, rng)
+    if move is not None:
+        position.unmake()
+    return move
+
+
+def result_value(result):
+    """Value of a finished game's FastBoard result for the side to move."""
+    return DRAW if result in DRAW_RESULTS else LOSS
+
+
+def rollout(position, rng=random, max_plies=ROLLOUT_PLIES):
+    """
+    Plays random legal moves until the game ends or 'max_plies' have been
+    played, then takes them all back. Returns WIN, DRAW or LOSS for the side
+    to move at the start.
+    """
+    side = position.side
+    start = position.ply
+    value = DRAW
+    while position.ply - start < max_plies:
+        result = position.quick_result()
+        if result is None:
+            if make_random_move(position, rng) is not None:
+                continue
+            value = LOSS
+        else:
+            value = result_value(result)
+        if position.side != side:
+            value = WIN - value
+        break
+    position.unwind(start)
+    return value
+
+
+def _rollout_job(job):
+    # pool worker: a rollout from (cells, side, en passant square, seed); no game history comes along
+    cells, side, ep, seed = job
+    return rollout(FastBoard(list(cells), side, ep), random.Random(seed))
+
+
+class Node:
+    """
+    One position in the tree. 'wins' and 'visits' are from the point of view
+    of the side that played 'move' to get here. 'untried' holds the legal
+    moves without a child yet, in random order, and is None until the node
+    is first walked through; 'outcome' is the value of a finished game for
+    the side to move, or None.
+    """
+
+    __slots__ = ("move", "parent", "key", "children", "untried", "visits", "wins", "outcome")
+
+    def __init__(self, move=None, parent=None, key=None):
+        self.move = move
+        self.parent = parent
+        self.key = key  # FastBoard.key() of the position
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+        self.outcome = None
+
+    def expand_moves(self, position, rng=random):
+        result = position.quick_result()
+        if result is not None:
+            self.outcome = result_value(result)
+            self.untried = []
+            return
+        self.untried = position.legal_moves()
+        rng.shuffle(self.untried)
+        if not self.untried:
+            self.outcome = LOSS
+
+    def select_child(self, exploration=EXPLORATION):
+        """The child with the highest UCT score."""
+        log_visits = math.log(self.visits)
+        best, best_score = None, -1.0
+        for child in self.children:
+            score = child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def best_child(self):
+        """The most visited child, or None."""
+        return max(self.children, key=lambda child: child.visits, default=None)
+
+    def find(self, key, plies=2):
+        """The node for the position 'key' at most 'plies' moves below this one, or None."""
+        if self.key == key:
+            return self
+        if plies:
+            for child in self.children:
+                node = child.find(key, plies - 1)
+                if node is not None:
+                    return node
+        return None
+
+
+class MCTS:
+    """
+    A search tree rooted at one position. run() adds simulations until a
+    deadline; the same MCTS can be moved on to a later position of the
+    game with reroot() and keeps the part of the tree below it.
+    """
+
+    def __init__(self, position, rng=random, exploration=EXPLORATION):
+        self.root = Node(key=position.key())
+        self.rng = rng
+        self.exploration = exploration
+        self.simulations = 0
+        self.max_depth = 0
+
+    def reroot(self, position):
+        """
+        Moves the root to 'position' if the tree holds it within two plies
+        (our move and the reply), dropping everything else. Returns whether
+        it did; if not, the tree starts over from 'position'.
+        """
+        node = self.root.find(position.key())
+        if node is None:
+            self.root = Node(key=position.key())
+            return False
+        node.parent = None
+        node.move = None
+        self.root = node
+        return True
+
+    def _select(self, position):
+        """
+        Walks from the root to a leaf, making the moves on 'position', adds
+        a visit to every node on the way (the virtual loss) and returns the
+        leaf: a new child, or a node whose game is over.
+        """
+        node = self.root
+        node.visits += 1
+        depth = 0
+        while True:
+            if node.untried is None:
+                node.expand_moves(position, self.rng)
+            if node.outcome is not None:
+                break
+            if node.untried:
+                move = node.untried.pop()
+                position.make(move)
+                child = Node(move, node, position.key())
+                node.children.append(child)
+                node = child
+                node.visits += 1
+                depth += 1
+                break
+            node = node.select_child(self.exploration)
+            position.make(node.move)
+            node.visits += 1
+            depth += 1
+        self.max_depth = max(self.max_depth, depth)
+        return node
+
+    @staticmethod
+    def _backup(node, value):
+        # 'value' is for the side to move at 'node'; the visits were counted by _select()
+        while node is not None:
+            value = WIN - value
+            node.wins += value
+            node = node.parent
+
+    def run_batch(self, position, batch=1, pool=None):
+        """
+        One round of 'batch' simulations from the root 'position', which is
+        left as it was. Rollouts run on 'pool' (a multiprocessing.Pool) if
+        given, else here, straight after each selection.
+        """
+        start = position.ply
+        finished = []  # (leaf, value)
+        jobs = []
+        leaves = []
+        for _ in range(batch):
+            leaf = self._select(position)
+            if leaf.outcome is not None:
+                finished.append((leaf, leaf.outcome))
+            elif pool is None:
+                finished.append((leaf, rollout(position, self.rng)))
+            else:
+                leaves.append(leaf)
+                jobs.append((bytes(position.board), position.side, position.ep, self.rng.getrandbits(32)))
+            position.unwind(start)
+        if jobs:
+            finished += zip(leaves, pool.map(_rollout_job, jobs))
+        for leaf, value in finished:
+            self._backup(leaf, value)
+        self.simulations += batch
+
+    def principal_variation(self, length=8):
+        """The most visited line from the root."""
+        pv = []
+        node = self.root.best_child()
+        while node is not None and len(pv) < length:
+            pv.append(node.move)
+            node = node.best_child()
+        return pv
+
+    def win_rate(self):
+        """Share of the simulations through the best root move that the side to move won."""
+        child = self.root.best_child()
+        if child is None or not child.visits:
+            return None
+        return child.wins / child.visits
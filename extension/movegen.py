@@ -0,0 +1,223 @@
+"""
+Move and attack tables for the 5x5 board, built once at import time.
+
+Leapers (Knight, King and the knight half of Right) and pawns use per-square
+target lists. Sliders use one table per ray: the occupancy of the ray's
+squares indexes the moves up to the first blocker, so a ray is resolved with
+one lookup instead of a square-by-square walk. Every move is a small int
+built here once, with its capture and promotion flags already set, so
+generation allocates nothing per move.
+"""
+from extension.piece_codes import SIZE, SQUARES, EMPTY, PAWN, KNIGHT, BISHOP, RIGHT, QUEEN, KING, \
+    TYPE_MASK, BLACK_BIT, UNMOVED, PAWN_DIRECTION, PROMOTION_ROW
+
+# A move is to | from << FROM_SHIFT, plus CAPTURE (en passant included) and PROMOTION flags:
+# 12 bits, so it fits array('H'). from == to never happens, so 0 stands for no move.
+FROM_SHIFT = 5
+SQUARE_MASK = (1 << FROM_SHIFT) - 1
+SQUARES_MASK = (1 << 2 * FROM_SHIFT) - 1  # from and to without the flags
+CAPTURE = 1 << 10
+PROMOTION = 1 << 11
+TACTICAL = CAPTURE | PROMOTION
+NO_MOVE = 0
+
+KNIGHT_OFFSETS = [(1, 2), (2, 1), (2, -1), (1, -2),
+                  (-1, -2), (-2, -1), (-2, 1), (-1, 2)]
+KING_OFFSETS = [(1, 1), (1, 0), (1, -1), (0, -1),
+                (-1, -1), (-1, 0), (-1, 1), (0, 1)]
+STRAIGHT_DIRECTIONS = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+DIAGONAL_DIRECTIONS = [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+
+def move_code(frm, to, flags=0):
+    return to | frm << FROM_SHIFT | flags
+
+
+def move_squares(move):
+    """(from, to) of a move."""
+    return move >> FROM_SHIFT & SQUARE_MASK, move & SQUARE_MASK
+
+
+def _on_board(x, y):
+    return 0 <= x < SIZE and 0 <= y < SIZE
+
+
+def _targets(sq, offsets):
+    x, y = sq % SIZE, sq // SIZE
+    return [(y + dy) * SIZE + x + dx for dx, dy in offsets if _on_board(x + dx, y + dy)]
+
+
+def _ray(sq, direction):
+    x, y = sq % SIZE, sq // SIZE
+    dx, dy = direction
+    squares = []
+    x, y = x + dx, y + dy
+    while _on_board(x, y):
+        squares.append(y * SIZE + x)
+        x, y = x + dx, y + dy
+    return squares
+
+
+def _ray_table(sq, squares):
+    """
+    Maps every occupancy of the ray's squares to (quiet moves, blocker move, blocker square).
+    The blocker move is a capture if the blocker is an enemy piece.
+    """
+    table = {}
+    for subset in range(1 << len(squares)):
+        occ = 0
+        for i, ray_sq in enumerate(squares):
+            if subset >> i & 1:
+                occ |= 1 << ray_sq
+        quiet = []
+        blocker = -1
+        for ray_sq in squares:
+            if occ >> ray_sq & 1:
+                blocker = ray_sq
+                break
+            quiet.append(move_code(sq, ray_sq))
+        table[occ] = (tuple(quiet), move_code(sq, blocker, CAPTURE) if blocker >= 0 else None, blocker)
+    return table
+
+
+def _rays(sq, directions):
+    rays = []
+    for direction in directions:
+        squares = _ray(sq, direction)
+        if squares:
+            mask = 0
+            for ray_sq in squares:
+                mask |= 1 << ray_sq
+            rays.append((mask, _ray_table(sq, squares)))
+    return rays
+
+
+KNIGHT_TARGETS = [_targets(sq, KNIGHT_OFFSETS) for sq in range(SQUARES)]
+KING_TARGETS = [_targets(sq, KING_OFFSETS) for sq in range(SQUARES)]
+# (target, quiet move, capture move) per leap from each square
+KNIGHT_MOVES = [[(to, move_code(sq, to), move_code(sq, to, CAPTURE)) for to in KNIGHT_TARGETS[sq]]
+                for sq in range(SQUARES)]
+KING_MOVES = [[(to, move_code(sq, to), move_code(sq, to, CAPTURE)) for to in KING_TARGETS[sq]]
+              for sq in range(SQUARES)]
+
+# (mask, table) per ray leaving each square
+STRAIGHT_RAYS = [_rays(sq, STRAIGHT_DIRECTIONS) for sq in range(SQUARES)]
+DIAGONAL_RAYS = [_rays(sq, DIAGONAL_DIRECTIONS) for sq in range(SQUARES)]
+QUEEN_RAYS = [STRAIGHT_RAYS[sq] + DIAGONAL_RAYS[sq] for sq in range(SQUARES)]
+
+# the squares along each ray from every square, nearest first, empty rays included
+STRAIGHT_RAY_SQUARES = [[_ray(sq, direction) for direction in STRAIGHT_DIRECTIONS] for sq in range(SQUARES)]
+DIAGONAL_RAY_SQUARES = [[_ray(sq, direction) for direction in DIAGONAL_DIRECTIONS] for sq in range(SQUARES)]
+
+
+def _pawn_move(colour, frm, to, flags=0):
+    if to // SIZE == PROMOTION_ROW[colour]:
+        flags |= PROMOTION
+    return to, move_code(frm, to, flags)
+
+
+# per colour: (target, move) for the single and double step and the diagonal captures,
+# and the squares a pawn attacks 'sq' from
+PAWN_PUSHES = [[[_pawn_move(colour, sq, to) for to in _ray(sq, (0, PAWN_DIRECTION[colour]))[:2]]
+                for sq in range(SQUARES)] for colour in (0, 1)]
+PAWN_CAPTURES = [[[_pawn_move(colour, sq, to, CAPTURE)
+                   for to in _targets(sq, [(1, PAWN_DIRECTION[colour]), (-1, PAWN_DIRECTION[colour])])]
+                  for sq in range(SQUARES)] for colour in (0, 1)]
+PAWN_ATTACKERS = [[_targets(sq, [(1, -PAWN_DIRECTION[colour]), (-1, -PAWN_DIRECTION[colour])])
+                   for sq in range(SQUARES)] for colour in (0, 1)]
+
+
+def add_piece_moves(moves, board, occ, side, ep, frm, code):
+    """Appends the pseudo-legal moves of the piece 'code' on 'frm' to 'moves'."""
+    piece_type = code & TYPE_MASK
+    own_bit = code & BLACK_BIT
+
+    if piece_type == PAWN:
+        pushes = PAWN_PUSHES[side][frm]
+        if pushes and board[pushes[0][0]] == EMPTY:
+            moves.append(pushes[0][1])
+            if code & UNMOVED and len(pushes) > 1 and board[pushes[1][0]] == EMPTY:
+                moves.append(pushes[1][1])
+        for to, move in PAWN_CAPTURES[side][frm]:
+            target = board[to]
+            if target != EMPTY:
+                if target & BLACK_BIT != own_bit:
+                    moves.append(move)
+            elif to == ep:
+                moves.append(move)
+        return
+
+    if piece_type == KNIGHT or piece_type == RIGHT:
+        for to, quiet, capture in KNIGHT_MOVES[frm]:
+            target = board[to]
+            if target == EMPTY:
+                moves.append(quiet)
+            elif target & BLACK_BIT != own_bit:
+                moves.append(capture)
+    elif piece_type == KING:
+        for to, quiet, capture in KING_MOVES[frm]:
+            target = board[to]
+            if target == EMPTY:
+                moves.append(quiet)
+            elif target & BLACK_BIT != own_bit:
+                moves.append(capture)
+        return
+
+    if piece_type == RIGHT:
+        rays = STRAIGHT_RAYS[frm]
+    elif piece_type == BISHOP:
+        rays = DIAGONAL_RAYS[frm]
+    elif piece_type == QUEEN:
+        rays = QUEEN_RAYS[frm]
+    else:
+        return
+    for mask, table in rays:
+        quiet, capture, blocker = table[occ & mask]
+        moves.extend(quiet)
+        if capture is not None and board[blocker] & BLACK_BIT != own_bit:
+            moves.append(capture)
+
+
+def is_attacked(board, occ, sq, by_colour):
+    """True if any piece of 'by_colour' could capture on 'sq' (pins ignored, as in chessmaker)."""
+    bit = BLACK_BIT if by_colour else 0
+
+    knight, right = KNIGHT | bit, RIGHT | bit
+    for t in KNIGHT_TARGETS[sq]:
+        code = board[t]
+        if code == knight or code == right:
+            return True
+
+    king = KING | bit
+    for t in KING_TARGETS[sq]:
+        if board[t] == king:
+            return True
+
+    pawn = PAWN | bit
+    for t in PAWN_ATTACKERS[by_colour][sq]:
+        if board[t] & ~UNMOVED == pawn:
+            return True
+
+    queen = QUEEN | bit
+    for mask, table in STRAIGHT_RAYS[sq]:
+        blocker = table[occ & mask][2]
+        if blocker >= 0:
+            code = board[blocker]
+            if code == right or code == queen:
+                return True
+    bishop = BISHOP | bit
+    for mask, table in DIAGONAL_RAYS[sq]:
+        blocker = table[occ & mask][2]
+        if blocker >= 0:
+            code = board[blocker]
+            if code == bishop or code == queen:
+                return True
+    return False
+
+
+def occupancy(board):
+    occ = 0
+    for sq, code in enumerate(board):
+        if code:
+            occ |= 1 << sq
+    return occ
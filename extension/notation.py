@@ -0,0 +1,201 @@
+"""
+Text notation for 5x5 positions, in the spirit of FEN:
+
+    nqkbr/ppppp/5/PPPPP/RBKQN w -
+
+Rows run from y = 0 (black's back row in samples.py) to y = 4, each from
+x = 0, and digits count empty squares. K King, Q Queen, R Right, B Bishop,
+N Knight, P a pawn that has not moved yet (it may still double step) and A
+a pawn that has; white upper case, black lower case. Pawn_Q pawns move the
+way PAWN_DIRECTION says for their colour. Then come the side to move, w or
+b, and the en passant square as "x,y", or "-".
+
+The binary form is RECORD_SIZE bytes per position: a nibble per square,
+square 2i in the low half of byte i, then the side to move in the high half
+of byte 12, the en passant square in byte 13 (NO_EP for none) and two zero
+bytes. A nibble is the piece code without UNMOVED, except that 7 (white)
+and 15 (black) are pawns that have not moved.
+
+Moves are written "x,y-x,y", the form human_player reads.
+
+FastBoard.from_board() rejects pawns that do not move the Pawn_Q way for
+their colour, so both forms only describe positions the engine can play.
+"""
+from chessmaker.chess.base import Player
+
+from extension.fast_board import FastBoard
+from extension.movegen import move_squares, SQUARES_MASK, FROM_SHIFT
+from extension.piece_codes import SIZE, SQUARES, CODES, EMPTY, PAWN, KNIGHT, BISHOP, RIGHT, QUEEN, KING, \
+    TYPE_MASK, BLACK_BIT, UNMOVED
+
+# white piece codes by letter; black ones are the lower case letters
+PIECE_LETTERS = {"K": KING, "Q": QUEEN, "R": RIGHT, "B": BISHOP, "N": KNIGHT, "P": PAWN | UNMOVED, "A": PAWN}
+LETTER_CODES = {}
+for _letter, _code in PIECE_LETTERS.items():
+    LETTER_CODES[_letter] = _code
+    LETTER_CODES[_letter.lower()] = _code | BLACK_BIT
+CODE_LETTERS = {code: letter for letter, code in LETTER_CODES.items()}
+
+SIDES = ("w", "b")
+
+RECORD_SIZE = 16
+NO_EP = 255
+UNMOVED_NIBBLE = 7
+
+# piece code -> nibble, nibble -> piece code (None where no piece has that nibble)
+CODE_NIBBLES = [0] * CODES
+NIBBLE_CODES = [None] * 16
+for _code in set(LETTER_CODES.values()) | {EMPTY}:
+    _nibble = (_code & BLACK_BIT) | (UNMOVED_NIBBLE if _code & UNMOVED else _code & TYPE_MASK)
+    CODE_NIBBLES[_code] = _nibble
+    NIBBLE_CODES[_nibble] = _code
+# record byte -> the codes of its two squares
+BYTE_CODES = [(NIBBLE_CODES[b & 15], NIBBLE_CODES[b >> 4]) for b in range(256)]
+PAIR_BYTES = SQUARES // 2
+
+
+def square_text(sq):
+    return f"{sq % SIZE},{sq // SIZE}"
+
+
+def parse_square(text):
+    x, y = (int(part) for part in text.split(","))
+    if not (0 <= x < SIZE and 0 <= y < SIZE):
+        raise ValueError(f"square off the board: {text!r}")
+    return y * SIZE + x
+
+
+def parse_cells(rows):
+    """The rows field -> a list of 25 FastBoard piece codes."""
+    cells = []
+    row_texts = rows.split("/")
+    if len(row_texts) != SIZE:
+        raise ValueError(f"expected {SIZE} rows: {rows!r}")
+    for row in row_texts:
+        start = len(cells)
+        for char in row:
+            if char.isdigit():
+                cells += [EMPTY] * int(char)
+            elif char in LETTER_CODES:
+                cells.append(LETTER_CODES[char])
+            else:
+                raise ValueError(f"unknown piece letter {char!r}")
+        if len(cells) - start != SIZE:
+            raise ValueError(f"row {row!r} does not have {SIZE} squares")
+    return cells
+
+
+def cells_text(cells):
+    """25 piece codes -> the rows field."""
+    rows = []
+    for y in range(SIZE):
+        row = ""
+        empty = 0
+        for code in cells[y * SIZE:(y + 1) * SIZE]:
+            if code == EMPTY:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            row += CODE_LETTERS[code]
+        if empty:
+            row += str(empty)
+        rows.append(row)
+    return "/".join(rows)
+
+
+def parse_position(text):
+    """Notation -> FastBoard. Raises ValueError on anything malformed."""
+    fields = text.split()
+    if len(fields) != 3:
+        raise ValueError(f"expected rows, side and en passant square: {text!r}")
+    rows, side, ep = fields
+    if side not in SIDES:
+        raise ValueError(f"side to move must be w or b: {side!r}")
+    cells = parse_cells(rows)
+    return FastBoard(cells, SIDES.index(side), -1 if ep == "-" else parse_square(ep))
+
+
+def position_text(position):
+    """FastBoard -> notation."""
+    ep = "-" if position.ep == -1 else square_text(position.ep)
+    return f"{cells_text(position.board)} {SIDES[position.side]} {ep}"
+
+
+def move_text(move):
+    """A move in the "x,y-x,y" form human_player reads."""
+    frm, to = move_squares(move)
+    return f"{square_text(frm)}-{square_text(to)}"
+
+
+def parse_move(position, text):
+    """The legal move of 'position' written 'text' ("x,y-x,y"); ValueError if there is none."""
+    try:
+        frm, to = (parse_square(part) for part in text.split("-"))
+    except ValueError:
+        raise ValueError(f"moves are written x,y-x,y: {text!r}") from None
+    squares = frm << FROM_SHIFT | to
+    for move in position.legal_moves():
+        if move & SQUARES_MASK == squares:
+            return move
+    raise ValueError(f"illegal move {text!r}")
+
+
+def encode_cells(cells, side, ep=-1):
+    """25 piece codes, side to move and en passant square -> a binary record."""
+    nibbles = CODE_NIBBLES
+    data = bytearray(RECORD_SIZE)
+    for i in range(PAIR_BYTES):
+        data[i] = nibbles[cells[2 * i]] | nibbles[cells[2 * i + 1]] << 4
+    data[PAIR_BYTES] = nibbles[cells[SQUARES - 1]] | side << 4
+    data[PAIR_BYTES + 1] = NO_EP if ep == -1 else ep
+    return bytes(data)
+
+
+def decode_cells(record):
+    """A binary record -> (25 piece codes, side to move, en passant square or -1)."""
+    cells = []
+    for byte in record[:PAIR_BYTES]:
+        cells += BYTE_CODES[byte]
+    last = record[PAIR_BYTES]
+    cells.append(NIBBLE_CODES[last & 15])
+    if None in cells or last >> 4 > 1:
+        raise ValueError("not a position record")
+    ep = record[PAIR_BYTES + 1]
+    return cells, last >> 4, -1 if ep == NO_EP else ep
+
+
+def encode_position(position):
+    """FastBoard -> binary record."""
+    return encode_cells(position.board, position.side, position.ep)
+
+
+def decode_position(record):
+    """Binary record -> FastBoard."""
+    cells, side, ep = decode_cells(record)
+    return FastBoard(cells, side, ep)
+
+
+def default_players():
+    return [Player("white"), Player("black")]
+
+
+def board_text(board):
+    """chessmaker Board -> notation."""
+    return position_text(FastBoard.from_board(board))
+
+
+def board_from_text(text, players=None):
+    """Notation -> chessmaker Board, with new white and black players unless given [white, black]."""
+    return parse_position(text).to_board(players or default_players())
+
+
+def board_record(board):
+    """chessmaker Board -> binary record."""
+    return encode_position(FastBoard.from_board(board))
+
+
+def board_from_record(record, players=None):
+    """Binary record -> chessmaker Board, players as for board_from_text()."""
+    return decode_position(record).to_board(players or default_players())
@@ -0,0 +1,148 @@
+"""
+Move ordering state for a search: killer moves, a history table and
+counter moves, on top of MVV-LVA for captures. A Session carries it from
+one move of a game to the next (see age()).
+
+Every move gets a single integer key. Captures and promotions are looked up
+in tables indexed by piece code, built once at import time, so ordering a
+node costs two board reads per move.
+"""
+from array import array
+
+from extension.evaluation import PIECE_VALUES
+from extension.movegen import FROM_SHIFT, SQUARE_MASK, SQUARES_MASK, TACTICAL
+from extension.piece_codes import SQUARES, CODES, PIECE_NAMES, TYPE_MASK, PAWN, QUEEN, PROMOTION_ROW, \
+    SIZE, colour_of
+
+# key tiers, highest first; history scores stay below COUNTER_KEY
+TT_KEY = 1 << 30
+CAPTURE_KEY = 1 << 26
+KILLER_KEYS = (1 << 25, (1 << 25) - 1)
+COUNTER_KEY = 1 << 24
+HISTORY_MAX = (1 << 24) - 1
+
+# plies with killer slots; searches stop at agent.MAX_SEARCH_DEPTH (64) plies below the root
+KILLER_PLIES = 128
+
+
+def _value(code):
+    return PIECE_VALUES.get(PIECE_NAMES.get(code & TYPE_MASK), 0)
+
+
+# MVV-LVA with the same weights as agent.get_mvvlva_score, indexed [attacker code][victim code]
+CAPTURE_KEYS = [[CAPTURE_KEY + _value(victim) * 10 - _value(attacker) if victim else 0
+                 for victim in range(CODES)] for attacker in range(CODES)]
+
+# pawn moves onto the last row promote to Queen: ordered with the captures
+PROMOTION_KEYS = [[0] * SQUARES for _ in range(CODES)]
+for _code in range(CODES):
+    if _code & TYPE_MASK == PAWN:
+        for _to in range(SQUARES):
+            if _to // SIZE == PROMOTION_ROW[colour_of(_code)]:
+                PROMOTION_KEYS[_code][_to] = CAPTURE_KEY + (_value(QUEEN) - _value(PAWN)) * 10
+
+EP_KEY = CAPTURE_KEY + _value(PAWN) * 10 - _value(PAWN)
+
+
+def tactical_key(cells, move):
+    """The key of a capture or promotion on the piece list 'cells'; 0 for a quiet move."""
+    if not move & TACTICAL:
+        return 0
+    to = move & SQUARE_MASK
+    piece = cells[move >> FROM_SHIFT & SQUARE_MASK]
+    victim = cells[to]
+    if victim:
+        return CAPTURE_KEYS[piece][victim]
+    # a promotion, or else en passant
+    return PROMOTION_KEYS[piece][to] or EP_KEY
+
+
+def sort_tactical(moves, board):
+    """
+    Captures and promotions first, by the keys MoveOrdering.sort gives them;
+    quiet moves keep their order behind them. For searches without killer
+    and history tables, such as the quiescence search.
+    """
+    cells = board.board
+    moves.sort(key=lambda move: tactical_key(cells, move), reverse=True)
+
+
+class MoveOrdering:
+    """
+    Killers: two quiet moves per ply that caused a beta cutoff, in one
+    preallocated array('H'), slots 2 * ply and 2 * ply + 1 (NO_MOVE when empty).
+    History: side x move squares (move & SQUARES_MASK) counter, bumped by
+    depth^2 on every quiet cutoff.
+    Counter moves: the quiet move that last refuted the opponent's previous move.
+    """
+
+    def __init__(self, root_ply=0):
+        self.root_ply = root_ply  # board.ply at the root, so board.ply - root_ply is the search ply
+        self.killers = array("H", bytes(4 * KILLER_PLIES))
+        self.history = [[0] * (SQUARES_MASK + 1) for _ in range(2)]
+        self.counter_moves = {}
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def age(self, plies=2):
+        """
+        Carries the tables over to a search 'plies' further into the game:
+        killers move up to the plies they now belong to and history scores
+        halve, so the new search's cutoffs soon outweigh the old ones.
+        """
+        del self.killers[:2 * plies]
+        self.killers.extend(array("H", bytes(4 * plies)))
+        self.history = [[score >> 1 for score in side] for side in self.history]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def sort(self, moves, board, tt_move=None):
+        slot = 2 * (board.ply - self.root_ply)
+        cells = board.board
+        history = self.history[board.side]
+        killer_1 = self.killers[slot]
+        killer_2 = self.killers[slot + 1]
+        counter = self.counter_moves.get(board.last_move())
+
+        def key(move):
+            if move == tt_move:
+                return TT_KEY
+            if move & TACTICAL:
+                return tactical_key(cells, move)
+            if move == killer_1:
+                return KILLER_KEYS[0]
+            if move == killer_2:
+                return KILLER_KEYS[1]
+            if move == counter:
+                return COUNTER_KEY
+            return history[move & SQUARES_MASK]
+
+        moves.sort(key=key, reverse=True)
+
+    def is_quiet(self, move):
+        return not move & TACTICAL
+
+    def record_cutoff(self, board, move, depth, index):
+        """Called at the node that failed high, after the cutting move was unmade."""
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+        if not self.is_quiet(move):
+            return
+        killers = self.killers
+        slot = 2 * (board.ply - self.root_ply)
+        if killers[slot] != move:
+            killers[slot + 1] = killers[slot]
+            killers[slot] = move
+        history = self.history[board.side]
+        i = move & SQUARES_MASK
+        history[i] = min(history[i] + depth * depth, HISTORY_MAX)
+        previous = board.last_move()
+        if previous is not None:
+            self.counter_moves[previous] = move
+
+    def first_move_cutoff_rate(self):
+        """Fraction of beta cutoffs produced by the first move searched."""
+        if not self.cutoffs:
+            return 0.0
+        return self.first_move_cutoffs / self.cutoffs
@@ -0,0 +1,149 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+from extension.transposition import TranspositionTable, table_bytes
+from extension.ordering import MoveOrdering
+from extension.search_control import SearchContext, SearchController
+
+# search processes per move, the main search included; 1 keeps agent() single-process and deterministic
+DEFAULT_WORKERS = 1
+
+# seconds to wait for a helper to notice the stop event before it is terminated
+JOIN_TIMEOUT = 1.0
+
+
+def workers_for(var, default=DEFAULT_WORKERS):
+    """Number of search processes for one agent() call: the "workers" entry of a dict 'var'."""
+    if isinstance(var, dict) and var.get("workers"):
+        return max(1, int(var["workers"]))
+    return default
+
+
+def process_context():
+    """multiprocessing context for search processes: fork starts one without re-importing chessmaker."""
+    # spawn is the fallback where fork is missing
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable in a multiprocessing.shared_memory block, so every
+    process of a Lazy SMP search reads and writes the same entries. The
+    process that creates it must close() and unlink() it; helpers attach
+    by name and only close().
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=table_bytes(size_mb))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        super().__init__(buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def close(self):
+        super().close()
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _worker_context(position, tt, deadline, stop):
+    # the caller's deadline, not a fresh budget from when this process started
+    control = SearchController(max(0.0, deadline - time.time()), margin=1.0, stop=stop)
+    return SearchContext(tt, control, MoveOrdering(position.ply))
+
+
+def _run_helper(search, position, table_name, generation, index, depth_offset, deadline, stop, nodes):
+    tt = SharedTranspositionTable(name=table_name)
+    tt.generation = generation
+    try:
+        nodes[index] = search(position, _worker_context(position, tt, deadline, stop), depth_offset)
+    finally:
+        tt.close()
+
+
+def _run_ponder(search, position, table_name, generation, deadline, stop, result):
+    tt = SharedTranspositionTable(name=table_name)
+    tt.generation = generation
+    try:
+        result[:] = search(position, _worker_context(position, tt, deadline, stop))
+    finally:
+        tt.close()
+
+
+class HelperGroup:
+    """
+    Lazy SMP helpers: 'count' processes that each run 'search' over the same
+    root position, writing into the shared table the main search also uses.
+    Odd helpers start one ply deeper, so the helpers do not all search the
+    same tree in step. Their own results are thrown away; what the main
+    search gains is the filled-in table.
+
+    search(position, ctx, depth_offset) must return the number of nodes it
+    searched once ctx.control aborts it.
+    """
+
+    def __init__(self, search, position, table, count, deadline):
+        ctx = process_context()
+        self.stop_event = ctx.Event()
+        self.nodes = ctx.Array("q", count, lock=False)
+        self.processes = []
+        for index in range(count):
+            process = ctx.Process(
+                target=_run_helper,
+                args=(search, position, table.name, table.generation, index, index % 2, deadline,
+                      self.stop_event, self.nodes),
+                daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def stop(self):
+        """Stops every helper and returns the nodes they searched."""
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes = []
+        return sum(self.nodes)
+
+
+class PonderSearch:
+    """
+    One background process searching the position expected after the
+    opponent's reply, on the opponent's time, into a shared table.
+
+    search(position, ctx) must return (nodes, completed depth, encoded best
+    move, score) once ctx.control aborts it; stop() hands that back. 'key'
+    is the position's FastBoard.key(), to recognise it when it comes up.
+    """
+
+    def __init__(self, search, position, table, time_limit):
+        ctx = process_context()
+        self.key = position.key()
+        self.stop_event = ctx.Event()
+        self.result = ctx.Array("q", 4, lock=False)
+        self.process = ctx.Process(
+            target=_run_ponder,
+            args=(search, position, table.name, table.generation, time.time() + time_limit,
+                  self.stop_event, self.result),
+            daemon=True)
+        self.process.start()
+
+    def stop(self):
+        """Stops the search; returns (nodes, depth, move code, score), with depth 0 if no iteration finished."""
+        self.stop_event.set()
+        self.process.join(JOIN_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        return tuple(self.result)
@@ -0,0 +1,31 @@
+# Squares are numbered y * 5 + x, the same order chessmaker's board.get_pieces() walks them.
+SIZE = 5
+SQUARES = SIZE * SIZE
+
+WHITE = 0
+BLACK = 1
+
+# A square holds 0 (empty) or a piece code: type | colour bit | pawn flag.
+EMPTY = 0
+PAWN = 1
+KNIGHT = 2
+BISHOP = 3
+RIGHT = 4
+QUEEN = 5
+KING = 6
+TYPE_MASK = 7
+BLACK_BIT = 8
+UNMOVED = 16  # pawn that has not moved yet and may still double step
+CODES = 32  # every piece code is below this
+
+PIECE_NAMES = {PAWN: "Pawn", KNIGHT: "Knight", BISHOP: "Bishop",
+               RIGHT: "Right", QUEEN: "Queen", KING: "King"}
+PIECE_TYPES = {name: piece_type for piece_type, name in PIECE_NAMES.items()}
+
+# Pawn_Q pawns: white moves up (towards y = 0), black moves down.
+PAWN_DIRECTION = (-1, 1)
+PROMOTION_ROW = (0, SIZE - 1)
+
+
+def colour_of(code):
+    return (code & BLACK_BIT) >> 3
@@ -0,0 +1,123 @@
+"""
+Files of positions in extension/notation.py's binary form, for corpora of
+millions of positions (benchmarks, tablebase work, test sets): a header,
+then RECORD_SIZE-byte records back to back. The count follows from the
+file size, so a file can be appended to without rewriting the header.
+
+PositionFile memory-maps a file and decodes records only as they are
+asked for, as piece-code lists, FastBoards or, only on request,
+chessmaker Boards.
+"""
+import mmap
+import os
+import struct
+
+from extension.notation import RECORD_SIZE, NIBBLE_CODES, encode_cells, decode_cells, decode_position, \
+    default_players
+from extension.piece_codes import SQUARES
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"P55\0"
+VERSION = 1
+HEADER = struct.Struct("<4sBB")  # magic, version, record size
+
+
+def write_positions(path, positions, append=False):
+    """
+    Writes FastBoards, or (cells, side, en passant square) tuples, to 'path'
+    and returns how many. 'append' adds them to an existing file.
+    """
+    exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+    count = 0
+    with open(path, "ab" if exists else "wb") as f:
+        if not exists:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        for position in positions:
+            if isinstance(position, tuple):
+                f.write(encode_cells(*position))
+            else:
+                f.write(encode_cells(position.board, position.side, position.ep))
+            count += 1
+    return count
+
+
+class PositionFile:
+    """
+    A memory-mapped position file. len() is the number of positions;
+    indexing or iterating gives FastBoards, iter_cells() the cheaper
+    (cells, side, ep) tuples and board() a chessmaker Board.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION or record_size != RECORD_SIZE:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a version {VERSION} position file")
+        self.count = (len(self._mmap) - HEADER.size) // RECORD_SIZE
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        """The binary record of one position, as bytes."""
+        if not -self.count <= index < self.count:
+            raise IndexError(index)
+        start = HEADER.size + index % self.count * RECORD_SIZE
+        return self._mmap[start:start + RECORD_SIZE]
+
+    def cells(self, index):
+        """(25 piece codes, side to move, en passant square or -1) of one position."""
+        return decode_cells(self.record(index))
+
+    def __getitem__(self, index):
+        return decode_position(self.record(index))
+
+    def board(self, index, players=None):
+        """One position as a chessmaker Board, with new players unless given [white, black]."""
+        return self[index].to_board(players or default_players())
+
+    def iter_cells(self, start=0, stop=None):
+        """(cells, side, en passant square) of positions start..stop, read straight from the map."""
+        data = self._mmap
+        stop = self.count if stop is None else min(stop, self.count)
+        for offset in range(HEADER.size + start * RECORD_SIZE, HEADER.size + stop * RECORD_SIZE, RECORD_SIZE):
+            yield decode_cells(data[offset:offset + RECORD_SIZE])
+
+    def __iter__(self):
+        for index in range(self.count):
+            yield self[index]
+
+    def code_array(self, start=0, stop=None):
+        """
+        Piece codes of positions start..stop as a uint8 (N, 25) array, the
+        rows batch_eval.evaluate_batch() takes. Needs numpy.
+        """
+        if np is None:
+            raise RuntimeError("code_array() needs numpy")
+        stop = self.count if stop is None else min(stop, self.count)
+        records = np.frombuffer(self._mmap, dtype=np.uint8, count=(stop - start) * RECORD_SIZE,
+                                offset=HEADER.size + start * RECORD_SIZE).reshape(-1, RECORD_SIZE)
+        nibbles = np.empty((len(records), SQUARES + 1), dtype=np.uint8)
+        nibbles[:, 0::2] = records[:, :(SQUARES + 1) // 2] & 15
+        nibbles[:, 1::2] = records[:, :(SQUARES + 1) // 2] >> 4
+        # a new array: nothing keeps pointing into the map once this returns
+        return _NIBBLE_CODES[nibbles[:, :SQUARES]]
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if np is not None:
+    _NIBBLE_CODES = np.array([code or 0 for code in NIBBLE_CODES], dtype=np.uint8)
@@ -0,0 +1,122 @@
+import time
+
+from extension.search_stats import SearchStats
+
+# seconds per move when 'var' does not say otherwise
+DEFAULT_TIME_LIMIT = 30
+
+
+class SearchAborted(Exception):
+    """Raised inside the search when the controller's deadline has passed."""
+
+
+def time_limit_for(var, default=DEFAULT_TIME_LIMIT):
+    """
+    Time budget for one agent() call, taken from its 'var' argument:
+    a number of seconds, or a dict with a "time_limit" entry.
+    """
+    if isinstance(var, (int, float)) and not isinstance(var, bool) and var > 0:
+        return float(var)
+    if isinstance(var, dict) and var.get("time_limit"):
+        return float(var["time_limit"])
+    return default
+
+
+def history_for(var):
+    """
+    The game's board_rules.RepetitionHistory from the "history" entry of a
+    dict 'var', with the board to move from as its latest entry, or None.
+    With it the search sees the repetitions of the game so far.
+    """
+    if isinstance(var, dict):
+        return var.get("history")
+    return None
+
+
+def depth_limit_for(var, default=None):
+    """Fixed search depth for one agent() call: the "depth" entry of a dict 'var', or 'default'."""
+    if isinstance(var, dict) and var.get("depth"):
+        return int(var["depth"])
+    return default
+
+
+class SearchController:
+    """
+    Hard deadline for one search, checked every CHECK_EVERY nodes.
+
+    The search calls tick() once per node; when the deadline has passed it
+    raises SearchAborted, which agent() catches at the root. It also records
+    the nodes and time of each finished iteration so the driver can predict,
+    from the effective branching factor, whether another iteration would
+    finish in time.
+
+    'stop' is an optional event (threading or multiprocessing) that aborts
+    the search at the next check as well; Lazy SMP helpers use it to stop
+    when the main search is done. 'check_every' replaces CHECK_EVERY for a
+    search whose nodes are expensive enough that 1024 of them overrun a
+    short budget (the mate solver).
+    """
+
+    CHECK_EVERY = 1024
+
+    def __init__(self, time_limit, margin=0.95, stop=None, check_every=None):
+        self.start = time.time()
+        self.time_limit = time_limit
+        self.check_every = check_every or self.CHECK_EVERY
+        # keep a little of the budget for converting the move back to chessmaker objects
+        self.deadline = self.start + time_limit * margin
+        self.stop = stop
+        self.nodes = 0
+        self.iterations = []  # (depth, nodes, seconds) per finished iteration
+        self._iteration_start = (0, self.start)
+
+    def tick(self):
+        self.nodes += 1
+        if self.nodes % self.check_every == 0:
+            self.check()
+
+    def check(self):
+        if time.time() >= self.deadline or (self.stop is not None and self.stop.is_set()):
+            raise SearchAborted()
+
+    def elapsed(self):
+        return time.time() - self.start
+
+    def start_iteration(self):
+        self._iteration_start = (self.nodes, time.time())
+
+    def finish_iteration(self, depth):
+        nodes, started = self._iteration_start
+        self.iterations.append((depth, self.nodes - nodes, time.time() - started))
+
+    def branching_factor(self):
+        """Effective branching factor: node ratio of the last two finished iterations."""
+        if len(self.iterations) < 2 or self.iterations[-2][1] == 0:
+            return None
+        return self.iterations[-1][1] / self.iterations[-2][1]
+
+    def predict_next_iteration(self):
+        """Estimated seconds for the next iteration, or None before there is enough data."""
+        factor = self.branching_factor()
+        if factor is None:
+            return None
+        return self.iterations[-1][2] * max(factor, 1.0)
+
+    def should_start_iteration(self):
+        now = time.time()
+        if now >= self.deadline:
+            return False
+        predicted = self.predict_next_iteration()
+        return predicted is None or now + predicted < self.deadline
+
+
+class SearchContext:
+    """Per-search state the negamax recursion carries from node to node."""
+
+    __slots__ = ("tt", "control", "ordering", "stats")
+
+    def __init__(self, tt, control, ordering=None, stats=None):
+        self.tt = tt
+        self.control = control
+        self.ordering = ordering
+        self.stats = stats if stats is not None else SearchStats()
@@ -0,0 +1,117 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+
+# functions shown in the profile summary a SearchStats carries
+PROFILE_LINES = 25
+
+
+class SearchStats:
+    """
+    Counters and timings for one agent() search.
+
+    negamax fills them in as it goes; search_position() returns the object
+    next to the move and passes it to any sinks. 'iterations' holds the
+    (depth, nodes, seconds) of every finished iteration, so nodes per depth
+    and the effective branching factor come from there. Time spent in move
+    generation, get_result and evaluate is measured around each call, so
+    the get_result time includes the move generation it does itself.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.score = None
+        self.best_move = None  # "x,y-x,y"
+        self.pv = []  # principal variation from the table, best move first
+        self.seconds = 0.0
+        self.nodes = 0
+        self.helper_nodes = 0
+        self.iterations = []
+        self.leaf_nodes = 0
+        self.terminal_nodes = 0
+        self.quiescence_nodes = 0  # nodes below the horizon
+        self.delta_prunes = 0  # captures quiescence skipped as too small to reach alpha
+        self.see_prunes = 0  # ... and as losing material by static exchange evaluation
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.null_cutoffs = 0
+        self.illegal_moves = 0  # pseudo-legal moves made and taken back as they left the king attacked
+        self.reductions = 0  # late moves searched with a reduced depth
+        self.reduction_researches = 0  # ... that beat alpha and were searched again at full depth
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.tablebase_hits = 0
+        self.mate_nodes = 0  # nodes of the mate solver before the search
+        self.mate_plies = None  # length of the line it proved, if it proved one
+        self.movegen_seconds = 0.0
+        self.result_seconds = 0.0
+        self.eval_seconds = 0.0
+        self.ponder = None  # "hit" or "miss" when a ponder search was running for this move
+        self.profile = None  # pstats summary when the move was profiled
+
+    def nodes_per_depth(self):
+        return {depth: nodes for depth, nodes, _ in self.iterations}
+
+    def branching_factor(self):
+        """Node ratio of the last two finished iterations, or None."""
+        if len(self.iterations) < 2 or self.iterations[-2][1] == 0:
+            return None
+        return self.iterations[-1][1] / self.iterations[-2][1]
+
+    def to_dict(self):
+        data = {name: value for name, value in vars(self).items() if name != "iterations"}
+        data["nodes_per_depth"] = self.nodes_per_depth()
+        data["iterations"] = [{"depth": depth, "nodes": nodes, "seconds": round(seconds, 6)}
+                              for depth, nodes, seconds in self.iterations]
+        data["branching_factor"] = self.branching_factor()
+        return data
+
+    def summary(self):
+        parts = [f"depth {self.depth}", f"score {self.score}", f"move {self.best_move}",
+                 f"{self.nodes + self.helper_nodes} nodes in {self.seconds:.2f}s"]
+        factor = self.branching_factor()
+        if factor is not None:
+            parts.append(f"branching {factor:.2f}")
+        parts += [f"{self.beta_cutoffs} cutoffs", f"TT {self.tt_hits}/{self.tt_probes} hits",
+                  f"movegen {self.movegen_seconds:.2f}s", f"get_result {self.result_seconds:.2f}s",
+                  f"evaluate {self.eval_seconds:.2f}s"]
+        return ", ".join(parts)
+
+
+class LoggingSink:
+    """Logs a one-line summary of every search."""
+
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logger or logging.getLogger("agent")
+        self.level = level
+
+    def __call__(self, stats):
+        self.logger.log(self.level, "%s", stats.summary())
+        if stats.profile:
+            self.logger.log(self.level, "%s", stats.profile)
+
+
+class JsonlSink:
+    """Appends every search's statistics to a JSON Lines file."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, stats):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(stats.to_dict()) + "\n")
+
+
+def profiled(function, *args):
+    """
+    Runs function(*args) under cProfile. Returns (result, summary), the
+    summary being the top PROFILE_LINES entries by cumulative time.
+    """
+    profile = cProfile.Profile()
+    result = profile.runcall(function, *args)
+    out = io.StringIO()
+    pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    return result, out.getvalue()
@@ -0,0 +1,123 @@
+"""
+Static exchange evaluation: the material a capture wins or loses once
+both sides have recaptured on its square with their least valuable
+attacker for as long as it pays them. Pieces that move off a line uncover
+the sliders behind them, as the attackers are looked up again after every
+capture with the taken squares cleared from the occupancy.
+
+Values are PIECE_VALUES, the ones agent.get_mvvlva_score uses, except that
+the king counts as KING_VALUE: it recaptures last, and never onto a square
+the other side still attacks.
+"""
+from extension.evaluation import PIECE_VALUES
+from extension.movegen import KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACKERS, STRAIGHT_RAYS, DIAGONAL_RAYS, \
+    PROMOTION, move_squares
+from extension.piece_codes import SIZE, TYPE_MASK, BLACK_BIT, UNMOVED, PIECE_NAMES, PAWN, KNIGHT, BISHOP, \
+    RIGHT, QUEEN, KING, PAWN_DIRECTION, colour_of
+
+KING_VALUE = 100000
+
+# piece value by piece type
+SEE_VALUES = [0] * (TYPE_MASK + 1)
+for _piece_type, _name in PIECE_NAMES.items():
+    SEE_VALUES[_piece_type] = PIECE_VALUES[_name]
+SEE_VALUES[KING] = KING_VALUE
+
+# a pawn that promotes on the capture becomes a Queen
+PROMOTION_GAIN = SEE_VALUES[QUEEN] - SEE_VALUES[PAWN]
+
+
+def _slider(board, occ, rays, sq, first, second):
+    for mask, table in rays[sq]:
+        blocker = table[occ & mask][2]
+        if blocker >= 0:
+            code = board[blocker]
+            if code == first or code == second:
+                return blocker
+    return -1
+
+
+def least_valuable_attacker(board, occ, sq, colour):
+    """
+    The square of the cheapest piece of 'colour' on 'occ' that attacks 'sq',
+    or -1. Pieces off 'occ' have already been traded on 'sq'.
+    """
+    bit = BLACK_BIT if colour else 0
+
+    pawn = PAWN | bit
+    for t in PAWN_ATTACKERS[colour][sq]:
+        if occ >> t & 1 and board[t] & ~UNMOVED == pawn:
+            return t
+    knight = KNIGHT | bit
+    for t in KNIGHT_TARGETS[sq]:
+        if occ >> t & 1 and board[t] == knight:
+            return t
+    bishop = BISHOP | bit
+    found = _slider(board, occ, DIAGONAL_RAYS, sq, bishop, bishop)
+    if found >= 0:
+        return found
+    right = RIGHT | bit
+    for t in KNIGHT_TARGETS[sq]:
+        if occ >> t & 1 and board[t] == right:
+            return t
+    found = _slider(board, occ, STRAIGHT_RAYS, sq, right, right)
+    if found >= 0:
+        return found
+    queen = QUEEN | bit
+    found = _slider(board, occ, STRAIGHT_RAYS, sq, queen, queen)
+    if found < 0:
+        found = _slider(board, occ, DIAGONAL_RAYS, sq, queen, queen)
+    if found >= 0:
+        return found
+    king = KING | bit
+    for t in KING_TARGETS[sq]:
+        if occ >> t & 1 and board[t] == king:
+            return t
+    return -1
+
+
+def see(position, move):
+    """
+    Material the side to move of FastBoard 'position' wins with the capture
+    (or promotion) 'move' once the exchange on its square is over, in
+    PIECE_VALUES units; negative if the capture loses material.
+    """
+    board = position.board
+    frm, to = move_squares(move)
+    attacker = board[frm]
+    colour = colour_of(attacker)
+    occ = position.occ & ~(1 << frm)
+
+    victim = board[to]
+    if victim:
+        gains = [SEE_VALUES[victim & TYPE_MASK]]
+    elif to == position.ep and attacker & TYPE_MASK == PAWN:
+        # en passant: the pawn taken is beside the target square, not on it
+        gains = [SEE_VALUES[PAWN]]
+        occ &= ~(1 << (to - SIZE * PAWN_DIRECTION[colour]))
+    else:
+        gains = [0]
+    on_square = SEE_VALUES[attacker & TYPE_MASK]
+    if move & PROMOTION:
+        gains[0] += PROMOTION_GAIN
+        on_square = SEE_VALUES[QUEEN]
+
+    colour ^= 1
+    while True:
+        sq = least_valuable_attacker(board, occ, to, colour)
+        if sq < 0:
+            break
+        # what the side capturing now stands at if the exchange stops after this capture
+        gains.append(on_square - gains[-1])
+        if max(-gains[-2], gains[-1]) < 0:
+            # neither stopping nor going on can change the outcome any more
+            break
+        occ &= ~(1 << sq)
+        on_square = SEE_VALUES[board[sq] & TYPE_MASK]
+        colour ^= 1
+
+    # either side may stop recapturing when that suits it better
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
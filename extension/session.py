@@ -0,0 +1,88 @@
+from array import array
+
+from extension.dfpn import ProofTable
+from extension.ordering import MoveOrdering
+from extension.parallel import SharedTranspositionTable
+from extension.transposition import TranspositionTable
+
+
+class Session:
+    """
+    What agent() keeps from one move of a game to the next: the
+    transposition table, the move-ordering tables, the principal variation
+    of the last search, the mate solver's proof table and the running
+    ponder search, if any.
+
+    start_search() ages it all before every search: table entries from
+    earlier searches are replaced first, history scores halve and killers
+    move up two plies. A position with more pieces than the last one means
+    a new game, which drops the ordering tables and the PV; callers that
+    know better can call new_game() themselves.
+    """
+
+    def __init__(self, tt_size_mb=16, mate_entries=200000):
+        self.tt_size_mb = tt_size_mb
+        self.tt = None
+        self.mate_entries = mate_entries
+        self.proofs = None  # extension.dfpn.ProofTable
+        self.ordering = MoveOrdering()
+        self.pv = array("H")  # moves from the last searched root
+        self.ponder = None  # extension.parallel.PonderSearch
+        self.pieces = None  # piece count at the last search
+        self.searches = 0
+
+    def table(self, shared=False):
+        """
+        The session's table, made on first use. 'shared' moves it into
+        shared memory for helper and ponder processes, keeping its entries.
+        """
+        if self.tt is None:
+            self.tt = SharedTranspositionTable(self.tt_size_mb) if shared else TranspositionTable(self.tt_size_mb)
+        elif shared and not isinstance(self.tt, SharedTranspositionTable):
+            table = SharedTranspositionTable(self.tt_size_mb)
+            table.copy_from(self.tt)
+            self.tt.close()
+            self.tt = table
+        return self.tt
+
+    def mate_table(self):
+        """The mate solver's table, made on first use. A proof found for one move still holds on the next."""
+        if self.proofs is None:
+            self.proofs = ProofTable(self.mate_entries)
+        return self.proofs
+
+    def start_search(self, position):
+        """Called with the root FastBoard before every search."""
+        pieces = position.occ.bit_count()
+        if self.pieces is not None and pieces > self.pieces:
+            # pieces only ever leave the board during a game
+            self.new_game()
+        elif self.searches:
+            self.ordering.age()
+        self.pieces = pieces
+        self.searches += 1
+        self.ordering.root_ply = position.ply
+        if self.tt is not None:
+            self.tt.new_search()
+
+    def new_game(self):
+        """Forgets the ordering tables and PV. Table entries stay, they are keyed by position."""
+        self.ordering = MoveOrdering()
+        self.pv = array("H")
+
+    def stop_pondering(self):
+        """Stops the ponder search. Returns (the PonderSearch, what its stop() returned), or None."""
+        if self.ponder is None:
+            return None
+        ponder, self.ponder = self.ponder, None
+        return ponder, ponder.stop()
+
+    def close(self):
+        """Stops pondering and frees the table. The session can still be used; it starts a new table."""
+        self.stop_pondering()
+        self.proofs = None
+        if self.tt is not None:
+            self.tt.close()
+            if isinstance(self.tt, SharedTranspositionTable):
+                self.tt.unlink()
+            self.tt = None
@@ -0,0 +1,221 @@
+import mmap
+import os
+import struct
+
+from extension.piece_codes import SIZE, SQUARES, WHITE, BLACK, PAWN, KNIGHT, BISHOP, RIGHT, \
+    QUEEN, KING, TYPE_MASK, UNMOVED, PROMOTION_ROW, colour_of
+
+# generate_tablebases.py writes here and load_tablebases() reads from here by default
+TABLEBASE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tablebases")
+
+# Win/draw/loss for the side to move. ILLEGAL marks indexes that are not a
+# reachable position (two pieces on one square, the side not to move in check).
+DRAW = 0
+WIN = 1
+LOSS = 2
+ILLEGAL = 3
+
+# file layout: header, then one WDL byte and one DTM byte plane of 'size' entries each
+MAGIC = b"TB55"
+VERSION = 1
+HEADER = struct.Struct("<4sB8sI")
+
+PIECE_LETTERS = {"K": KING, "Q": QUEEN, "R": RIGHT, "B": BISHOP, "N": KNIGHT, "P": PAWN}
+LETTERS = {piece_type: letter for letter, piece_type in PIECE_LETTERS.items()}
+
+# strongest first: the order pieces appear in a material name
+LETTER_ORDER = "KQRBNP"
+
+# the square seen from the other side of the board (for tables probed with colours swapped)
+MIRROR = [(SIZE - 1 - sq // SIZE) * SIZE + sq % SIZE for sq in range(SQUARES)]
+
+
+def _side_name(types):
+    return "".join(sorted((LETTERS[t] for t in types), key=LETTER_ORDER.index))
+
+
+def _strength(name):
+    # more pieces first, then the stronger pieces
+    return len(name), [-LETTER_ORDER.index(c) for c in name]
+
+
+def material_name(signature):
+    """
+    Name of the table covering 'signature', plus whether the colours must
+    be swapped to probe it. The stronger side always comes first ("KQK"),
+    so black-strong positions use the same file as white-strong ones.
+    """
+    white, black = _side_name(signature[0]), _side_name(signature[1])
+    if _strength(black) > _strength(white):
+        return black + white, True
+    return white + black, False
+
+
+def parse_material(name):
+    """'KQK' -> ((KING, QUEEN), (KING,)): the piece types of each side, king first."""
+    if len(name) < 2 or name[0] != "K" or any(c not in PIECE_LETTERS for c in name):
+        raise ValueError(f"Bad material name: {name!r}")
+    strong, _, weak = name[1:].partition("K")
+    if "K" in weak or name.count("K") != 2:
+        raise ValueError(f"Bad material name: {name!r}")
+    if "P" in strong and "P" in weak:
+        # en passant is not part of the index
+        raise ValueError(f"Pawns on both sides are not supported: {name!r}")
+    strong = sorted("K" + strong, key=LETTER_ORDER.index)
+    weak = sorted("K" + weak, key=LETTER_ORDER.index)
+    return tuple(PIECE_LETTERS[c] for c in strong), tuple(PIECE_LETTERS[c] for c in weak)
+
+
+def board_pieces(board, occ):
+    """(square, code) for every piece, found through the occupancy bits."""
+    pieces = []
+    while occ:
+        low = occ & -occ
+        sq = low.bit_length() - 1
+        pieces.append((sq, board[sq]))
+        occ ^= low
+    return pieces
+
+
+def material_signature(pieces):
+    white = []
+    black = []
+    for _, code in pieces:
+        (black if colour_of(code) else white).append(code & TYPE_MASK)
+    return tuple(sorted(white)), tuple(sorted(black))
+
+
+class Tablebase:
+    """
+    Win/draw/loss and distance to the end of the game for every position
+    of one material set, with the first side of the name as white.
+
+    The index is built from the side to move, then the square of each piece
+    in name order (kings first), then one unmoved bit per pawn, since an
+    unmoved Pawn_Q may still double step. DTM counts plies until the game
+    ends by checkmate or stalemate (which the side to move loses), with
+    best play on both sides; draws and illegal indexes store 0.
+    """
+
+    def __init__(self, name, wdl=None, dtm=None):
+        strong, weak = parse_material(name)
+        self.name = _side_name(strong) + _side_name(weak)
+        self.pieces = [(WHITE, t) for t in strong] + [(BLACK, t) for t in weak]
+        self.pawns = [i for i, (_, t) in enumerate(self.pieces) if t == PAWN]
+        self.signature = (tuple(sorted(strong)), tuple(sorted(weak)))
+        self.size = 2 * SQUARES ** len(self.pieces) * 2 ** len(self.pawns)
+        self.wdl = wdl if wdl is not None else bytearray([ILLEGAL]) * self.size
+        self.dtm = dtm if dtm is not None else bytearray(self.size)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-maps a table file; the table reads straight from the page cache."""
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, name, size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} tablebase file")
+        view = memoryview(data)
+        start = HEADER.size
+        table = cls(name.rstrip(b"\0").decode("ascii"), view[start:start + size],
+                    view[start + size:start + 2 * size])
+        if table.size != size:
+            raise ValueError(f"{path} has {size} entries, expected {table.size}")
+        table._mmap = data
+        return table
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.name.encode("ascii"), self.size))
+            f.write(self.wdl)
+            f.write(self.dtm)
+
+    def index(self, pieces, side, flip):
+        """Index of a position given as (square, code) pairs; 'flip' swaps colours and mirrors the board."""
+        squares = {}
+        unmoved = {}
+        for sq, code in pieces:
+            key = (colour_of(code) ^ flip, code & TYPE_MASK)
+            squares.setdefault(key, []).append(MIRROR[sq] if flip else sq)
+            if code & TYPE_MASK == PAWN:
+                unmoved.setdefault(key, []).append(1 if code & UNMOVED else 0)
+        index = side ^ flip
+        for key in self.pieces:
+            index = index * SQUARES + squares[key].pop()
+        for i in self.pawns:
+            index = index * 2 + unmoved[self.pieces[i]].pop()
+        return index
+
+    def decode(self, index):
+        """(cells, side) for an index, or None if two pieces share a square or a pawn stands on its last row."""
+        flags = []
+        for _ in self.pawns:
+            index, bit = divmod(index, 2)
+            flags.append(bit)
+        squares = []
+        for _ in self.pieces:
+            index, sq = divmod(index, SQUARES)
+            squares.append(sq)
+        squares.reverse()
+        flags.reverse()
+        if len(set(squares)) != len(squares):
+            return None
+
+        cells = [0] * SQUARES
+        for i, ((colour, piece_type), sq) in enumerate(zip(self.pieces, squares)):
+            code = piece_type | (colour << 3)
+            if piece_type == PAWN:
+                if sq // SIZE == PROMOTION_ROW[colour]:
+                    return None
+                if flags[self.pawns.index(i)]:
+                    code |= UNMOVED
+            cells[sq] = code
+        return cells, index
+
+    def probe(self, pieces, side, flip):
+        """(wdl, dtm) for the side to move, or None for an illegal position."""
+        index = self.index(pieces, side, flip)
+        wdl = self.wdl[index]
+        if wdl == ILLEGAL:
+            return None
+        return wdl, self.dtm[index]
+
+
+class Tablebases:
+    """The loaded tables, looked up by the material on the board."""
+
+    def __init__(self):
+        self.tables = {}  # signature -> (table, flip)
+        self.max_pieces = 0
+
+    def add(self, table):
+        strong, weak = table.signature
+        self.tables[(strong, weak)] = (table, False)
+        self.tables.setdefault((weak, strong), (table, True))
+        self.max_pieces = max(self.max_pieces, len(table.pieces))
+
+    def probe(self, position):
+        """(wdl, dtm) for the side to move of a FastBoard, or None if no table covers it."""
+        count = position.occ.bit_count()
+        if count == 2:
+            # only the two kings are left: the game is drawn
+            return DRAW, 0
+        if count > self.max_pieces:
+            return None
+        pieces = board_pieces(position.board, position.occ)
+        signature = material_signature(pieces)
+        entry = self.tables.get(signature)
+        if entry is None:
+            return None
+        table, flip = entry
+        return table.probe(pieces, position.side, flip)
+
+
+def load_tablebases(directory=TABLEBASE_DIR):
+    """Memory-maps every .tb file in 'directory'; no directory means no tables."""
+    tables = Tablebases()
+    if os.path.isdir(directory):
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".tb"):
+                tables.add(Tablebase.load(os.path.join(directory, filename)))
+    return tables
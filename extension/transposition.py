@@ -0,0 +1,114 @@
+from extension.movegen import NO_MOVE
+
+EXACT = 0
+LOWER = 1  # score is a lower bound (the node failed high)
+UPPER = 2  # score is an upper bound (the node failed low)
+
+# two 64-bit words per entry: the key (xor-ed with the data) and the packed data
+ENTRY_BYTES = 16
+
+# data word layout: score + SCORE_OFFSET | move << 32 | depth << 48 | bound << 56 | generation << 58
+SCORE_OFFSET = 1 << 31
+
+# searches are numbered modulo GENERATIONS in the entries they write
+GENERATIONS = 64
+
+
+def encode_move(move):
+    """A move or None as an int that fits the 16-bit move field."""
+    return NO_MOVE if move is None else move
+
+
+def decode_move(code):
+    return None if code == NO_MOVE else code
+
+
+def _bucket_count(nbytes):
+    """Largest power-of-two number of two-slot buckets that fits in 'nbytes'."""
+    entries = max(2, nbytes // ENTRY_BYTES)
+    buckets = 1
+    while buckets * 4 <= entries:
+        buckets *= 2
+    return buckets
+
+
+def table_bytes(size_mb):
+    """Bytes used by a table capped at 'size_mb'."""
+    return _bucket_count(int(size_mb * 1024 * 1024)) * 2 * ENTRY_BYTES
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table stored in one flat buffer.
+
+    Every bucket has two slots: slot 0 keeps the deepest search seen for the
+    bucket (depth-preferred), slot 1 always takes the newest entry. The number
+    of buckets is the largest power of two that fits in 'size_mb'.
+
+    Each slot is two 64-bit words, the packed data and key ^ data, so a slot
+    torn by two processes writing at once fails the key check instead of
+    returning mixed-up data. Entries also carry the generation of the search
+    that wrote them: new_search() starts the next one, and slot 0 gives up
+    an entry from an earlier search whatever its depth. 'buffer' lets the table live in shared memory
+    (see extension/parallel.py); by default it is a private bytearray.
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        if buffer is None:
+            buffer = bytearray(table_bytes(size_mb))
+        self.buffer = buffer
+        buckets = _bucket_count(len(buffer))
+        self.mask = buckets - 1
+        size = buckets * 2
+        self._view = memoryview(buffer)
+        self.keys = self._view[:size * 8].cast("Q")
+        self.data = self._view[size * 8:size * 16].cast("Q")
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clear(self):
+        self._view[:] = bytes(len(self._view))
+
+    def new_search(self):
+        """Marks every entry so far as old, to be replaced first."""
+        self.generation = (self.generation + 1) % GENERATIONS
+
+    def copy_from(self, other):
+        """Takes over the entries and generation of a table of the same size."""
+        self.keys[:] = other.keys
+        self.data[:] = other.data
+        self.generation = other.generation
+
+    def close(self):
+        """Drops the views on the buffer; shared memory cannot be closed while they exist."""
+        self.keys.release()
+        self.data.release()
+        self._view.release()
+
+    def probe(self, key):
+        """Returns (depth, score, bound, move) for 'key', or None."""
+        i = (key & self.mask) << 1
+        for slot in (i, i + 1):
+            data = self.data[slot]
+            if data and self.keys[slot] ^ data == key:
+                return ((data >> 48) & 0xFF, (data & 0xFFFFFFFF) - SCORE_OFFSET, (data >> 56) & 3,
+                        decode_move((data >> 32) & 0xFFFF))
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        i = (key & self.mask) << 1
+        old = self.data[i]
+        same_key = old and self.keys[i] ^ old == key
+        if same_key or depth >= (old >> 48) & 0xFF or old >> 58 != self.generation:
+            slot = i
+            if move is None and same_key:
+                # keep the best move from an earlier search of the same position
+                move = decode_move((old >> 32) & 0xFFFF)
+        else:
+            slot = i + 1
+        data = ((score + SCORE_OFFSET) | encode_move(move) << 32
+                | min(depth, 127) << 48 | bound << 56 | self.generation << 58)
+        self.data[slot] = data
+        self.keys[slot] = key ^ data
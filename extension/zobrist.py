@@ -0,0 +1,27 @@
+import random
+
+from extension.piece_codes import SQUARES, CODES
+
+# Fixed seed so hashes (and transposition table contents) are reproducible between runs.
+_rng = random.Random(0x5EED5)
+
+
+def _key():
+    return _rng.getrandbits(64)
+
+
+# One key per FastBoard piece code (type | colour bit | unmoved-pawn flag) per
+# square. The pawn flag is hashed because it decides whether a double step is
+# available.
+PIECE_KEYS = [[_key() for _ in range(SQUARES)] for _ in range(CODES)]
+SIDE_KEY = _key()  # xor-ed in when black is to move
+EP_KEYS = [_key() for _ in range(SQUARES)]
+
+
+def hash_board(board, side):
+    """Full Zobrist hash of a piece list; FastBoard keeps it up to date incrementally."""
+    h = SIDE_KEY if side else 0
+    for sq, code in enumerate(board):
+        if code:
+            h ^= PIECE_KEYS[code][sq]
+    return h
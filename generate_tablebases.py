@@ -0,0 +1,138 @@
+# Python 3.11+
+"""
+Builds endgame tablebases by retrograde analysis.
+
+    python generate_tablebases.py [KQK KRK KPK ...] [--out tablebases]
+
+Every legal position of a material set is generated once to build the move
+graph; values then spread backwards from the checkmates and stalemates, one
+ply at a time, so each position gets the shortest win or the longest loss.
+Captures and promotions leave the table and take their value from the
+smaller table they reach, which is generated first when it is missing.
+"""
+import argparse
+import os
+import time
+
+from extension.fast_board import FastBoard, CHECKMATE, STALEMATE
+from extension.tablebase import Tablebase, Tablebases, TABLEBASE_DIR, DRAW, WIN, LOSS, \
+    material_name, board_pieces, material_signature
+
+DEFAULT_MATERIAL = ["KQK", "KRK", "KPK"]
+
+# DTM is stored in one byte
+MAX_DTM = 255
+
+
+def generate(name, tables, log=print):
+    """Solves one material set, adds it to 'tables' and returns it."""
+    table = Tablebase(name)
+    started = time.time()
+    size = table.size
+    wdl = table.wdl
+    dtm = table.dtm
+
+    predecessors = [None] * size
+    remaining = [0] * size  # successors inside the table not yet known to win for the opponent
+    exit_win = [0] * size  # shortest win through a capture or promotion, +1
+    exit_draw = bytearray(size)
+    exit_loss = [-1] * size  # longest loss through a capture or promotion
+    levels = {0: []}
+
+    for index in range(size):
+        layout = table.decode(index)
+        if layout is None:
+            continue
+        cells, side = layout
+        position = FastBoard(cells, side)
+        if position.is_attacked(position.kings[1 - side], side):
+            # the side that just moved would have left its king in check
+            continue
+        wdl[index] = DRAW
+
+        moves = position.legal_moves()
+        result = position.get_result(moves)
+        if result:
+            if result in (CHECKMATE, STALEMATE):
+                levels[0].append((index, LOSS))
+            continue
+
+        for move in moves:
+            position.make(move)
+            pieces = board_pieces(position.board, position.occ)
+            if material_signature(pieces) == table.signature:
+                target = table.index(pieces, position.side, False)
+                if predecessors[target] is None:
+                    predecessors[target] = []
+                predecessors[target].append(index)
+                remaining[index] += 1
+            else:
+                value = tables.probe(position)
+                if value is None:
+                    generate(material_name(material_signature(pieces))[0], tables, log)
+                    value = tables.probe(position)
+                result, distance = value
+                if result == LOSS:
+                    if not exit_win[index] or distance + 2 < exit_win[index]:
+                        exit_win[index] = distance + 2
+                elif result == DRAW:
+                    exit_draw[index] = 1
+                else:
+                    exit_loss[index] = max(exit_loss[index], distance)
+            position.unmake()
+
+        if exit_win[index]:
+            levels.setdefault(exit_win[index] - 1, []).append((index, WIN))
+        elif not remaining[index] and not exit_draw[index]:
+            levels.setdefault(exit_loss[index] + 1, []).append((index, LOSS))
+
+    # walk the levels in order: the first value a position gets is its best
+    solved = bytearray(size)
+    level = 0
+    while levels:
+        for index, value in levels.pop(level, ()):
+            if solved[index]:
+                continue
+            if level > MAX_DTM:
+                raise ValueError(f"{table.name}: distance {level} does not fit in a byte")
+            solved[index] = 1
+            wdl[index] = value
+            dtm[index] = level
+            for pred in predecessors[index] or ():
+                if solved[pred]:
+                    continue
+                if value == LOSS:
+                    levels.setdefault(level + 1, []).append((pred, WIN))
+                else:
+                    remaining[pred] -= 1
+                    if not remaining[pred] and not exit_win[pred] and not exit_draw[pred]:
+                        levels.setdefault(max(level, exit_loss[pred]) + 1, []).append((pred, LOSS))
+        level += 1
+
+    tables.add(table)
+    counts = [wdl.count(value) for value in (WIN, DRAW, LOSS)]
+    log(f"{table.name}: {counts[0]} wins, {counts[1]} draws, {counts[2]} losses for the side to move, "
+        f"longest {max(dtm)} plies. Took {time.time() - started:.1f} seconds")
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("material", nargs="*", default=DEFAULT_MATERIAL,
+                        help="material sets such as KQK, strongest side first (default: %(default)s)")
+    parser.add_argument("--out", default=TABLEBASE_DIR, help="output directory (default: %(default)s)")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    tables = Tablebases()
+    for name in args.material:
+        if Tablebase(name).signature not in tables.tables:
+            generate(name, tables)
+    for table in {t for t, _ in tables.tables.values()}:
+        path = os.path.join(args.out, table.name + ".tb")
+        table.save(path)
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Python 3.11+
+"""
+Monte Carlo Tree Search player (see extension/mcts.py) with the same
+agent(board, player, var) interface as agent.agent, so it can take its
+place in test.py or play in tournament.py as --player mcts_agent:agent.
+"""
+import atexit
+import time
+from time import perf_counter
+
+from extension.fast_board import FastBoard
+from extension.mcts import MCTS
+from extension.parallel import process_context, workers_for
+from extension.search_control import SearchController, time_limit_for, history_for
+from extension.search_stats import SearchStats
+from agent import move_text, STATS_SINKS
+
+# leaves selected per round for each pool process; a single process runs one simulation per round
+LEAVES_PER_WORKER = 16
+
+# the tree agent() keeps between moves, rerooted at the next position it is asked about
+_tree = None
+
+# process pool for batched rollouts, kept between moves; only made when "workers" asks for more than one
+_pool = None
+_pool_workers = 0
+
+
+def agent(board, player, var):
+    '''
+    UCT search with random rollouts for the side to move on 'board'.
+    'var' sets the time budget in seconds, as for agent.agent (see
+    time_limit_for); a dict 'var' may also set "workers" to play the
+    rollouts on a process pool, "simulations" to stop after that many,
+    "reuse": False to start from an empty tree and "history" as for agent.agent. The tree is kept after the
+    move, and the next call carries on from the node of the position it is
+    given, if the tree reached it.
+    '''
+    return search_position(board, var)[0]
+
+
+def search_position(board, var):
+    """The search behind agent(). Returns (best move, SearchStats) and hands the stats to the sinks."""
+    global _tree
+    started = perf_counter()
+    stats = SearchStats()
+    position = FastBoard.from_board(board, history_for(var))
+    legal_moves = position.legal_moves()
+    if not legal_moves:
+        return (None, None), stats
+
+    settings = var if isinstance(var, dict) else {}
+    if _tree is None or not settings.get("reuse", True) or not _tree.reroot(position):
+        _tree = MCTS(position)
+    tree = _tree
+    reused = tree.root.visits
+    deadline = SearchController(time_limit_for(var)).deadline
+    limit = settings.get("simulations")
+    workers = workers_for(var)
+    pool = pool_for(workers)
+    batch = LEAVES_PER_WORKER * workers if pool is not None else 1
+
+    done = 0
+    while (limit is None or done < limit) and (done == 0 or time.time() < deadline):
+        tree.run_batch(position, batch, pool)
+        done += batch
+
+    # a root that is already decided (two bare kings) grows no children
+    best = tree.root.best_child()
+    best_move = best.move if best is not None else legal_moves[0]
+    stats.depth = tree.max_depth
+    win_rate = tree.win_rate()
+    stats.score = round(win_rate * 100) if win_rate is not None else None  # percent
+    stats.best_move = move_text(best_move)
+    stats.pv = [move_text(move) for move in tree.principal_variation()]
+    stats.nodes = tree.root.visits - reused
+    stats.seconds = perf_counter() - started
+
+    sinks = list(STATS_SINKS) + settings.get("sinks", [])
+    for sink in sinks:
+        sink(stats)
+    return position.to_piece_move(board, best_move), stats
+
+
+def pool_for(workers):
+    """The rollout pool for 'workers' processes, made or resized on demand; None for a single process."""
+    global _pool, _pool_workers
+    if workers <= 1:
+        return None
+    if _pool is not None and _pool_workers != workers:
+        _close_pool()
+    if _pool is None:
+        _pool = process_context().Pool(workers)
+        _pool_workers = workers
+    return _pool
+
+
+@atexit.register
+def _close_pool():
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
@@ -0,0 +1,114 @@
+# Python 3.11+
+"""
+Perft: counts the leaf nodes of the move tree to a fixed depth.
+
+    python perft.py [--depth 3] [--divide] [--reference] [sample0 ...]
+
+FastBoard is counted by default; --reference also counts with chessmaker
+(list_legal_moves_for and copy_piece_move on cloned boards) and reports
+any position where the two disagree. Game results are not checked: a
+position only ends the count when it has no legal moves.
+"""
+import argparse
+import time
+
+from extension.board_utils import list_legal_moves_for, copy_piece_move
+from extension.fast_board import FastBoard
+from extension.movegen import move_squares
+from extension.piece_codes import SIZE
+from sample_boards import POSITIONS, make_custom_board
+
+
+def perft(position, depth):
+    """Leaf nodes below a FastBoard at 'depth' plies."""
+    moves = position.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make(move)
+        nodes += perft(position, depth - 1)
+        position.unmake()
+    return nodes
+
+
+def divide(position, depth):
+    """perft split by root move: {(from, to): nodes}."""
+    counts = {}
+    for move in position.legal_moves():
+        position.make(move)
+        counts[move_squares(move)] = perft(position, depth - 1) if depth > 1 else 1
+        position.unmake()
+    return counts
+
+
+def reference_perft(board, depth):
+    """perft on a chessmaker Board, the way test.py plays moves. Slow, but independent of FastBoard."""
+    moves = list_legal_moves_for(board, board.current_player)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for piece, move_opt in moves:
+        child, child_piece, child_move = copy_piece_move(board.clone(), piece, move_opt)
+        child_piece.move(child_move)
+        nodes += reference_perft(child, depth - 1)
+    return nodes
+
+
+def _square(pos):
+    return pos.y * SIZE + pos.x
+
+
+def reference_divide(board, depth):
+    counts = {}
+    for piece, move_opt in list_legal_moves_for(board, board.current_player):
+        child, child_piece, child_move = copy_piece_move(board.clone(), piece, move_opt)
+        child_piece.move(child_move)
+        move = (_square(piece.position), _square(move_opt.position))
+        counts[move] = reference_perft(child, depth - 1) if depth > 1 else 1
+    return counts
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("positions", nargs="*", default=list(POSITIONS), metavar="position",
+                        help=f"any of {', '.join(POSITIONS)} (default: all)")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--divide", action="store_true", help="print the count below every root move")
+    parser.add_argument("--reference", action="store_true", help="also count with chessmaker and compare")
+    args = parser.parse_args()
+    for name in args.positions:
+        if name not in POSITIONS:
+            parser.error(f"unknown position {name!r}")
+
+    mismatches = 0
+    for name in args.positions:
+        board, _ = make_custom_board(POSITIONS[name])
+        position = FastBoard.from_board(board)
+        counts, seconds = timed(divide, position, args.depth)
+        nodes = sum(counts.values())
+        print(f"{name} depth {args.depth}: {nodes} nodes, {seconds:.2f} seconds, {nodes / seconds:.0f} nodes/s")
+
+        if args.reference:
+            expected, ref_seconds = timed(reference_divide, board, args.depth)
+            print(f"  chessmaker: {sum(expected.values())} nodes, {ref_seconds:.2f} seconds")
+            for move in sorted(set(counts) | set(expected)):
+                if counts.get(move) != expected.get(move):
+                    mismatches += 1
+                    print(f"  MISMATCH {move}: fast board {counts.get(move)}, chessmaker {expected.get(move)}")
+        if args.divide:
+            for (frm, to), count in sorted(counts.items()):
+                print(f"  {frm % SIZE},{frm // SIZE}-{to % SIZE},{to // SIZE}: {count}")
+
+    if mismatches:
+        raise SystemExit(f"{mismatches} root moves disagree with chessmaker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+The samples.py positions by name, and the chessmaker Board set-up the
+harnesses share: test.py, perft.py, bench.py, tournament.py and
+engine_server.py all start their games here.
+"""
+from itertools import cycle
+
+from chessmaker.chess.base import Board
+
+from samples import white, black, sample0, sample1, sample_tactics, sample_mvvlva_test
+
+POSITIONS = {
+    "sample0": sample0,
+    "sample1": sample1,
+    "sample_tactics": sample_tactics,
+    "sample_mvvlva_test": sample_mvvlva_test,
+}
+
+
+def make_custom_board(board_sample):
+    # player1: white vs player2: black
+    players = [white, black]
+    board = Board(
+        squares=board_sample,
+        players=players,
+        turn_iterator=cycle(players),
+    )
+    return board, players
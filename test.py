@@ -1,30 +1,23 @@
 # Python 3.11+
 import sys
 from itertools import cycle
-from chessmaker.chess.base import Board
 from extension.board_utils import print_board_ascii, copy_piece_move
-from extension.board_rules import get_result
-from samples import white, black, sample0, sample1, sample_tactics, sample_mvvlva_test
+from extension.board_rules import get_result, RepetitionHistory
+from samples import sample0, sample1, sample_tactics, sample_mvvlva_test
+from sample_boards import make_custom_board
 from agent import agent, human_player
 from opponent import opponent
 
 
-def make_custom_board(board_sample):
-    # player1: white vs player2: black
-    players = [white, black]
-    board = Board(
-        squares=board_sample,
-        players=players,
-        turn_iterator=cycle(players),
-    )
-    return board, players
-
-
-def testgame(p_white, p_black, board_sample):
+def testgame(p_white, p_black, board_sample, ponder=False):
 
     board, players = make_custom_board(board_sample)
     turn_order = cycle(players)
-    var = None
+    # with 'ponder' the engine searches while the other side (usually human_player) thinks;
+    # off by default, so the timings stay comparable and no ponder process is left running
+    history = RepetitionHistory()
+    # the engine reads the game's repetitions from 'history', which grows after every move
+    var = {"ponder": ponder, "history": history}
     print("=== Initial position ===")
     print_board_ascii(board)
     while True:
@@ -41,7 +34,7 @@ def testgame(p_white, p_black, board_sample):
                     board, p_piece, p_move_opt)
 
             if (not piece) or (not move_opt):
-                res = get_result(board)
+                res = get_result(board, history)
                 if res:
                     print(f"=== Game ended: {res} ===")
                 else:
@@ -64,8 +57,9 @@ def testgame(p_white, p_black, board_sample):
                         f"=== Game ended: {player.name} can not make a legal move ===")
                     break
 
+            history.push(board)
             print_board_ascii(board)
-            res = get_result(board)
+            res = get_result(board, history)
             if res:
                 print(f"=== Game ended: {res} ===")
                 break
@@ -76,5 +70,6 @@ def testgame(p_white, p_black, board_sample):
 
 
 if __name__ == "__main__":
+    # python test.py [--ponder]
     testgame(p_white=agent, p_black=human_player,
-             board_sample=sample0)
+             board_sample=sample0, ponder="--ponder" in sys.argv[1:])
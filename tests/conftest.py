@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the engine's modules live at the repository root, which plain "pytest" does not put on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
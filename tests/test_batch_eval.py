@@ -0,0 +1,48 @@
+import random
+
+import pytest
+
+import agent
+import samples
+from extension import evaluation
+from extension.batch_eval import encode, evaluate_batch
+from extension.fast_board import FastBoard, WHITE
+from extension.mcts import make_random_move
+from sample_boards import make_custom_board
+
+SAMPLES = ["sample0", "sample1", "sample_tactics", "sample_mvvlva_test"]
+
+
+def random_positions(count, seed=0):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        position = FastBoard.from_board(make_custom_board(getattr(samples, rng.choice(SAMPLES)))[0])
+        for _ in range(rng.randrange(40)):
+            if position.quick_result() is not None or make_random_move(position, rng) is None:
+                break
+        positions.append(position)
+    return positions
+
+
+@pytest.mark.parametrize("with_mobility", [False, True])
+def test_batch_scores_equal_scalar_scores(monkeypatch, with_mobility):
+    monkeypatch.setattr(evaluation, "MOBILITY", with_mobility)
+    positions = random_positions(500)
+    scores = evaluate_batch(encode([position.board for position in positions]))
+    assert scores == [agent.evaluate(position, WHITE) for position in positions]
+
+
+@pytest.mark.parametrize("with_mobility", [False, True])
+def test_frontier_child_scores_equal_scalar_scores(monkeypatch, with_mobility):
+    # search_frontier() scores the children from child_cells() without making the moves
+    monkeypatch.setattr(evaluation, "MOBILITY", with_mobility)
+    for position in random_positions(100, seed=1):
+        moves = position.legal_moves()
+        scores = evaluate_batch(encode([position.child_cells(move) for move in moves]))
+        expected = []
+        for move in moves:
+            position.make(move)
+            expected.append(agent.evaluate(position, WHITE))
+            position.unmake()
+        assert scores == expected
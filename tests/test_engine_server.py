@@ -0,0 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import agent
+from engine_server import EngineServer, info_line
+from extension.search_stats import SearchStats
+
+
+def run_commands(lines):
+    """Answers of one EngineServer to 'lines', and whether it was still serving after each."""
+    answers = []
+
+    async def session():
+        with ThreadPoolExecutor(1) as executor:
+            server = EngineServer(answers.append, executor)
+            serving = [await server.handle(line) for line in lines]
+            await server.close()
+        return serving
+
+    return answers, asyncio.run(session())
+
+
+def test_truncated_go_is_an_error_not_a_crash():
+    answers, serving = run_commands(["position startpos", "go movetime", "go depth", "isready"])
+    assert serving == [True, True, True, True]
+    assert answers == ["info string go: movetime needs a number", "info string go: depth needs a number",
+                       "readyok"]
+
+
+def test_info_line_scores():
+    stats = SearchStats()
+    stats.depth = 0
+    stats.score = -agent.INFINITY
+    assert "score" not in info_line(stats)
+
+    stats.depth = 4
+    stats.score = 35
+    assert "score cp 35 " in info_line(stats)
+
+    # mated on the last ply of a depth-4 search
+    stats.score = -agent.WIN_SCORE
+    assert "score mate -4 " in info_line(stats)
+
+    stats.score = agent.WIN_SCORE
+    stats.mate_plies = 5
+    assert "score mate 5 " in info_line(stats)
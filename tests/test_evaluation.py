@@ -0,0 +1,27 @@
+import random
+
+import agent
+import samples
+from extension import evaluation
+from extension.fast_board import FastBoard
+from extension.mcts import make_random_move
+from sample_boards import make_custom_board
+
+SAMPLES = ["sample0", "sample1", "sample_tactics", "sample_mvvlva_test"]
+
+
+def test_incremental_score_does_not_drift(monkeypatch):
+    # with DEBUG set, every evaluate() recomputes the score from scratch and raises on a mismatch
+    monkeypatch.setattr(evaluation, "DEBUG", True)
+    rng = random.Random(0)
+    for game in range(200):
+        position = FastBoard.from_board(make_custom_board(getattr(samples, SAMPLES[game % len(SAMPLES)]))[0])
+        start_score = position.score
+        plies = 0
+        while plies < 80 and position.quick_result() is None and make_random_move(position, rng) is not None:
+            plies += 1
+            agent.evaluate(position, position.side)
+        for _ in range(plies):
+            position.unmake()
+            agent.evaluate(position, position.side)
+        assert position.score == start_score
@@ -0,0 +1,36 @@
+from extension.board_rules import RepetitionHistory
+from extension.fast_board import FastBoard, FIVEFOLD
+from extension.notation import parse_move, board_from_text
+from extension.search_control import history_for
+
+START = "4n/5/k3K/5/N4 w -"
+# both knights out and back: START is on the board again after every CYCLE
+CYCLE = ["0,4-1,2", "4,0-3,2", "1,2-0,4", "3,2-4,0"]
+
+
+def play(board, history, text):
+    position = FastBoard.from_board(board)
+    piece, move_opt = position.to_piece_move(board, parse_move(position, text))
+    piece.move(move_opt)
+    history.push(board)
+
+
+def cycle_result(position):
+    """quick_result() after one more CYCLE made on 'position'."""
+    for text in CYCLE:
+        position.make(parse_move(position, text))
+    return position.quick_result()
+
+
+def test_search_sees_the_game_history():
+    board = board_from_text(START)
+    history = RepetitionHistory()
+    for text in CYCLE * 4:
+        play(board, history, text)
+
+    position = FastBoard.from_board(board, history_for({"history": history}))
+    assert position.repetition_count() == history.count() == 4
+    # a search from here finds the fifth occurrence one cycle down
+    assert cycle_result(position) == FIVEFOLD
+    # ... which it cannot without the game's history
+    assert cycle_result(FastBoard.from_board(board)) is None
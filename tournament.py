@@ -0,0 +1,215 @@
+# Python 3.11+
+"""
+Headless match runner: plays many games between two move functions across
+a process pool and streams every game to a JSONL file.
+
+    python tournament.py [--games 100] [--time 0.2] [--workers N]
+                         [--player agent:agent] [--opponent opponent:opponent]
+                         [--positions sample0 sample1] [--out games.jsonl]
+    python tournament.py --summarize games.jsonl
+
+Players are given as module:function and are called like agent(board,
+player, var), with 'var' a dict of the per-move "time_limit" and the
+game's RepetitionHistory as "history". Games come in
+colour-swapped pairs from each start position. The referee is the same as
+test.py's: copy_piece_move, piece.move and board_rules.get_result with a
+RepetitionHistory, just without printing the board.
+"""
+import argparse
+import importlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import time
+
+from extension.board_rules import get_result, RepetitionHistory
+from extension.board_utils import copy_piece_move
+from sample_boards import POSITIONS, make_custom_board
+
+# plies after which a game is scored as a draw
+MAX_PLIES = 200
+
+
+def load_player(spec):
+    """'module:function' -> the function."""
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name or module)
+
+
+_start_boards = {}
+
+
+def start_board(name):
+    """
+    A fresh board for a samples.py position. The sample lists hold the
+    piece objects themselves, which a game moves around, so every game
+    plays on a clone of one untouched board per process.
+    """
+    if name not in _start_boards:
+        _start_boards[name] = make_custom_board(POSITIONS[name])[0]
+    return _start_boards[name].clone()
+
+
+def _loser(result):
+    # every result string ends in "<player> loses" unless it is a draw
+    for name in ("white", "black"):
+        if result.endswith(f"{name} loses"):
+            return name
+    return None
+
+
+def play_game(game):
+    """
+    Plays one game described by a dict with "id", "position", "white",
+    "black", "time_limit", "max_plies" and "seed". Returns the game record.
+    """
+    random.seed(game["seed"])
+    functions = {"white": load_player(game["white"]), "black": load_player(game["black"])}
+    board = start_board(game["position"])
+    history = RepetitionHistory()
+    moves = []
+    result = None
+    started = time.perf_counter()
+
+    while len(moves) < game["max_plies"]:
+        player = board.current_player
+        move_started = time.perf_counter()
+        var = {"time_limit": game["time_limit"], "history": history}
+        piece, move_opt = functions[player.name](board, player, var)
+        seconds = time.perf_counter() - move_started
+        board, piece, move_opt = copy_piece_move(board, piece, move_opt)
+        if not piece or not move_opt:
+            result = get_result(board, history) or f"No legal move returned - {player.name} loses"
+            break
+        start = piece.position
+        piece.move(move_opt)
+        moves.append({"player": player.name, "move": f"{start.x},{start.y}-{move_opt.position.x},{move_opt.position.y}",
+                      "seconds": round(seconds, 4)})
+        history.push(board)
+        result = get_result(board, history)
+        if result:
+            break
+    else:
+        result = f"Draw - {game['max_plies']} plies played"
+
+    loser = _loser(result)
+    winner = None if loser is None else ("black" if loser == "white" else "white")
+    return dict(game, result=result, winner=winner, plies=len(moves),
+                seconds=round(time.perf_counter() - started, 3), moves=moves)
+
+
+def schedule(games, positions, player, opponent, time_limit, max_plies=MAX_PLIES, seed=0):
+    """Game dicts in colour-swapped pairs, cycling through the start positions."""
+    scheduled = []
+    for i in range(games):
+        pair, second = divmod(i, 2)
+        white, black = (opponent, player) if second else (player, opponent)
+        scheduled.append({"id": i, "position": positions[pair % len(positions)], "white": white, "black": black,
+                         "time_limit": time_limit, "max_plies": max_plies, "seed": seed + i})
+    return scheduled
+
+
+def player_score(record, player):
+    """1, 0.5 or 0 for 'player' in a finished game."""
+    if record["winner"] is None:
+        return 0.5
+    return 1.0 if record[record["winner"]] == player else 0.0
+
+
+def summary(records, player):
+    """
+    Score of 'player' over 'records' with an Elo difference and its 95%
+    margin. A perfect or zero score has no Elo difference (all three None);
+    otherwise the bounds stop half a game short of a perfect or zero score.
+    """
+    scores = [player_score(record, player) for record in records]
+    n = len(scores)
+    if n == 0:
+        return {"games": 0}
+    wins = scores.count(1.0)
+    draws = scores.count(0.5)
+    mean = sum(scores) / n
+    deviation = math.sqrt(sum((s - mean) ** 2 for s in scores) / n)
+    margin = 1.96 * deviation / math.sqrt(n)
+    if 0 < mean < 1:
+        elo = _elo(mean), _elo(_clamp(mean - margin, n)), _elo(_clamp(mean + margin, n))
+    else:
+        elo = None, None, None
+    return {"games": n, "wins": wins, "draws": draws, "losses": n - wins - draws, "score": round(mean, 4),
+            "elo": elo[0], "elo_low": elo[1], "elo_high": elo[2],
+            "average_plies": round(sum(r["plies"] for r in records) / n, 1)}
+
+
+def _clamp(score, games):
+    return min(max(score, 0.5 / games), 1 - 0.5 / games)
+
+
+def _elo(score):
+    # 0 < score < 1: summary() keeps the infinite ends out; + 0.0 turns -0.0 into 0.0
+    return round(-400 * math.log10(1 / score - 1), 1) + 0.0
+
+
+def print_summary(records, player):
+    result = summary(records, player)
+    if not result["games"]:
+        print("No games played")
+        return
+    if result["elo"] is None:
+        elo = f"undefined (all games {'won' if result['wins'] else 'lost'})"
+    else:
+        elo = f"{result['elo']:+} ({result['elo_low']:+} to {result['elo_high']:+})"
+    print(f"{player}: {result['wins']} wins, {result['draws']} draws, {result['losses']} losses "
+          f"in {result['games']} games, score {result['score']:.1%}, Elo {elo}, "
+          f"{result['average_plies']} plies per game")
+    for position in sorted({r["position"] for r in records}):
+        part = summary([r for r in records if r["position"] == position], player)
+        print(f"  {position}: +{part['wins']} ={part['draws']} -{part['losses']}, score {part['score']:.1%}")
+
+
+def run(games, out, workers):
+    """Plays 'games' on a pool of 'workers' processes, appending each record to 'out' as it finishes."""
+    records = []
+    with open(out, "a") as f, multiprocessing.Pool(workers) as pool:
+        for record in pool.imap_unordered(play_game, games):
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            records.append(record)
+            print(f"game {record['id']} {record['position']} {record['white']} vs {record['black']}: "
+                  f"{record['result']} after {record['plies']} plies")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--time", type=float, default=0.2, help="seconds per move (default %(default)s)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--player", default="agent:agent")
+    parser.add_argument("--opponent", default="opponent:opponent")
+    parser.add_argument("--positions", nargs="+", default=list(POSITIONS), metavar="position")
+    parser.add_argument("--max-plies", type=int, default=MAX_PLIES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="tournament.jsonl", help="JSONL file the games are appended to")
+    parser.add_argument("--summarize", metavar="JSONL", help="only print the summary of an earlier run")
+    args = parser.parse_args()
+
+    if args.summarize:
+        with open(args.summarize) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        print_summary(records, args.player)
+        return
+
+    for name in args.positions:
+        if name not in POSITIONS:
+            parser.error(f"unknown position {name!r}")
+    games = schedule(args.games, args.positions, args.player, args.opponent, args.time, args.max_plies, args.seed)
+    started = time.time()
+    records = run(games, args.out, args.workers)
+    print(f"{len(records)} games in {time.time() - started:.0f} seconds, written to {args.out}")
+    print_summary(records, args.player)
+
+
+if __name__ == "__main__":
+    main()